@@ -0,0 +1,62 @@
+"""
+Compares JSON backends used by Response.apply_raw on payloads similar to API responses
+
+    PYTHONPATH=. python benchmarks/json_serialization.py
+"""
+import json
+import timeit
+import uuid
+
+from chasha.core import orjson, orjson_dumps, std_json_dumps
+
+
+def legacy_json_dumps(value) -> bytes:
+    # serialization before pluggable backends: default separators, str encoded by adapter
+    return json.dumps(value).encode('utf-8')
+
+
+def item(index: int) -> dict:
+    return {
+        'id': index,
+        'guid': str(uuid.UUID(int=index)),
+        'title': f'Задача номер {index}',
+        'done': index % 3 == 0,
+        'priority': index % 5,
+        'score': index / 7,
+        'tags': ['home', 'work', 'urgent'][:index % 4],
+        'owner': {'id': index % 17, 'name': f'user {index % 17}', 'email': None},
+    }
+
+
+PAYLOADS = {
+    'small dict': {'status': 'ok', 'id': 42, 'message': 'hello'},
+    'list of 100': [item(index) for index in range(100)],
+    'list of 10000': [item(index) for index in range(10000)],
+    'nested page': {
+        'items': [item(index) for index in range(500)],
+        'total': 500,
+        'next': '/items?page=2',
+    },
+}
+
+BACKENDS = {
+    'json.dumps (legacy)': legacy_json_dumps,
+    'stdlib tuned': std_json_dumps,
+}
+if orjson is not None:
+    BACKENDS['orjson'] = orjson_dumps
+
+
+def main():
+    print(f"{'payload':<16}{'backend':<22}{'size, bytes':>14}{'time, us':>12}")
+    for payload_name, payload in PAYLOADS.items():
+        for backend_name, dumps in BACKENDS.items():
+            timer = timeit.Timer(lambda: dumps(payload))  # noqa: B023
+            number, _ = timer.autorange()
+            best = min(timer.repeat(repeat=5, number=number)) / number
+            size = len(dumps(payload))
+            print(f'{payload_name:<16}{backend_name:<22}{size:>14}{best * 1e6:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
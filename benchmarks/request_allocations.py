@@ -0,0 +1,74 @@
+"""
+Measures memory allocated while Chasha.serve processes a request, peak traced by tracemalloc
+
+    PYTHONPATH=. python benchmarks/request_allocations.py
+"""
+import timeit
+import tracemalloc
+
+from chasha import Chasha, DI, Request
+
+
+app = Chasha()
+
+
+@app.get('/text')
+def text():
+    return 'ok'
+
+
+@app.get('/json')
+def json_items(page: int = DI.query()):
+    return {'page': page, 'items': [1, 2, 3]}
+
+
+@app.get('/cookies')
+def cookies(cookies: DI.Cookies = DI.cookies()):
+    cookies.set('visited', cookies.get('session') or 'anonymous')
+    return 'ok'
+
+
+HEADERS = {
+    'Host': 'example.com',
+    'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64)',
+    'Accept': 'application/json',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Accept-Encoding': 'gzip, deflate',
+    'Cookie': 'session=abc; theme=dark',
+}
+
+SCENARIOS = {
+    'text': lambda: Request(method='GET', path='/text', query={}, headers=HEADERS),
+    'json + query': lambda: Request(method='GET', path='/json', query={'page': '2'}, headers=HEADERS),
+    'cookies': lambda: Request(method='GET', path='/cookies', query={}, headers=HEADERS),
+    'not found': lambda: Request(method='GET', path='/missing', query={}, headers=HEADERS),
+}
+
+
+def peak_allocation(create_request, repeat: int = 200) -> int:
+    peaks = []
+    tracemalloc.start()
+    for _ in range(repeat):
+        request = create_request()
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        app.serve(request)
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - before)
+    tracemalloc.stop()
+    return min(peaks)
+
+
+def main():
+    print(f"{'scenario':<16}{'peak, bytes':>14}{'time, us':>12}")
+    for name, create_request in SCENARIOS.items():
+        for _ in range(10):
+            app.serve(create_request())
+        timer = timeit.Timer(lambda: app.serve(create_request()))  # noqa: B023
+        number, _ = timer.autorange()
+        best = min(timer.repeat(repeat=5, number=number)) / number
+        print(f'{name:<16}{peak_allocation(create_request):>14}{best * 1e6:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
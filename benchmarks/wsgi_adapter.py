@@ -0,0 +1,121 @@
+"""
+Measures per request overhead of WSGIAdapter, the handler is called with environ
+as produced by a WSGI server and compared with Chasha.serve of the same request built directly
+
+    PYTHONPATH=. python benchmarks/wsgi_adapter.py
+"""
+import io
+import sys
+import timeit
+
+from chasha import Chasha, DI, Request
+from chasha.contrib.adapters.wsgi import WSGIAdapter
+
+
+app = Chasha()
+adapter = WSGIAdapter(app)
+
+
+@app.get('/text')
+def text():
+    return 'ok'
+
+
+@app.get('/json')
+def json_items(page: int = DI.query(), cookies: DI.Cookies = DI.cookies()):
+    cookies.set('visited', cookies.get('session') or 'anonymous')
+    return {'page': page, 'items': [1, 2, 3]}
+
+
+@app.post('/items')
+def items(data: dict = DI.json_body()):
+    return data
+
+
+SERVER = {
+    'GATEWAY_INTERFACE': 'CGI/1.1',
+    'SCRIPT_NAME': '',
+    'SERVER_NAME': 'localhost',
+    'SERVER_PORT': '8000',
+    'SERVER_PROTOCOL': 'HTTP/1.1',
+    'SERVER_SOFTWARE': 'WSGIServer/0.2',
+    'REMOTE_ADDR': '127.0.0.1',
+    'REMOTE_HOST': '',
+    'wsgi.errors': sys.stderr,
+    'wsgi.multiprocess': False,
+    'wsgi.multithread': True,
+    'wsgi.run_once': False,
+    'wsgi.url_scheme': 'http',
+    'wsgi.version': (1, 0),
+    'HTTP_HOST': 'localhost:8000',
+    'HTTP_USER_AGENT': 'Mozilla/5.0 (X11; Linux x86_64; rv:131.0) Gecko/20100101 Firefox/131.0',
+    'HTTP_ACCEPT': 'application/json',
+    'HTTP_ACCEPT_LANGUAGE': 'en-US,en;q=0.5',
+    'HTTP_ACCEPT_ENCODING': 'gzip, deflate, br',
+    'HTTP_CONNECTION': 'keep-alive',
+    'HTTP_COOKIE': 'session=abc; theme=dark',
+}
+
+BODY = b'{"name": "item", "tags": ["a", "b"], "price": 10.5}'
+
+SCENARIOS = {
+    'text': dict(SERVER, REQUEST_METHOD='GET', PATH_INFO='/text', QUERY_STRING=''),
+    'json + query': dict(SERVER, REQUEST_METHOD='GET', PATH_INFO='/json', QUERY_STRING='page=2'),
+    'post json': dict(
+        SERVER, REQUEST_METHOD='POST', PATH_INFO='/items', QUERY_STRING='',
+        CONTENT_TYPE='application/json; charset=utf-8', CONTENT_LENGTH=str(len(BODY)),
+    ),
+    'not found': dict(SERVER, REQUEST_METHOD='GET', PATH_INFO='/missing', QUERY_STRING=''),
+}
+
+
+def start_response(status, headers):
+    pass
+
+
+def call_handler(environ: dict):
+    if 'CONTENT_LENGTH' in environ:
+        environ['wsgi.input'] = io.BytesIO(BODY)
+    return adapter.handler(environ, start_response)
+
+
+def direct_request(environ: dict) -> Request:
+    # the same request as the adapter passes to the application, prepared by hand
+    return Request(
+        method=environ['REQUEST_METHOD'],
+        path=environ['PATH_INFO'],
+        query={'page': '2'} if environ['QUERY_STRING'] else {},
+        headers={'cookie': environ['HTTP_COOKIE'], 'content-type': environ.get('CONTENT_TYPE', '')},
+        body=BODY if 'CONTENT_LENGTH' in environ else None,
+    )
+
+
+def best_time(func) -> float:
+    for _ in range(10):
+        func()
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=5, number=number)) / number
+
+
+def main():
+    print(f"{'scenario':<16}{'handler, us':>14}{'serve, us':>12}{'overhead, us':>15}")
+    for name, environ in SCENARIOS.items():
+        handler = best_time(lambda: call_handler(environ))  # noqa: B023
+        serve = best_time(lambda: app.serve(direct_request(environ)))  # noqa: B023
+        print(f'{name:<16}{handler * 1e6:>14.1f}{serve * 1e6:>12.1f}{(handler - serve) * 1e6:>15.1f}')
+
+    print()
+    print(f"{'step':<16}{'time, us':>14}")
+    environ = SCENARIOS['text']
+    steps = {
+        'status line': lambda: WSGIAdapter.get_status(200),
+        'headers': lambda: WSGIAdapter._get_headers(environ),
+        'charset': lambda: Request('GET', headers={'content-type': 'text/html; charset=latin-1'}).charset,
+    }
+    for name, step in steps.items():
+        print(f'{name:<16}{best_time(step) * 1e6:>14.2f}')
+
+
+if __name__ == '__main__':
+    main()
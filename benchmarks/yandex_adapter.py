@@ -0,0 +1,74 @@
+"""
+Measures per invocation overhead of YandexCloudAdapter, recorded API gateway events are replayed
+through the adapter and compared with Chasha.serve of the same request built directly
+
+    PYTHONPATH=. python benchmarks/yandex_adapter.py
+"""
+import base64
+import json
+import os
+import timeit
+
+from chasha import Chasha, DI, Request
+from chasha.contrib.adapters.yandex import YandexCloudAdapter
+
+
+app = Chasha()
+adapter = YandexCloudAdapter(app)
+
+
+@app.get('/text')
+def text():
+    return 'ok'
+
+
+@app.get('/json')
+def json_items(page: int = DI.query(), tag: list = DI.query(), cookies: DI.Cookies = DI.cookies()):
+    cookies.set('visited', cookies.get('session') or 'anonymous')
+    return {'page': page, 'tags': tag}
+
+
+@app.post('/items')
+def items(data: dict = DI.json_body()):
+    return data
+
+
+@app.put('/blob')
+def blob(content: bytes = DI.body()):
+    return {'size': len(content)}
+
+
+with open(os.path.join(os.path.dirname(__file__), 'fixtures', 'yandex_events.json'), encoding='utf-8') as f:
+    EVENTS = json.load(f)
+
+
+def direct_request(event: dict) -> Request:
+    # the same request as the adapter passes to the application, prepared by hand
+    return Request(
+        method=event['httpMethod'],
+        path=event['path'],
+        query=YandexCloudAdapter._denormalize_multi_value(event['multiValueQueryStringParameters']),
+        headers=event['headers'],
+        body=base64.b64decode(event['body']) if event['isBase64Encoded'] else event['body'],
+    )
+
+
+def best_time(func) -> float:
+    for _ in range(10):
+        func()
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=5, number=number)) / number
+
+
+def main():
+    print(f"{'event':<16}{'handler, us':>14}{'serve, us':>12}{'overhead, us':>15}")
+    for name, event in EVENTS.items():
+        assert adapter.handler(event, None)['statusCode'] == 200, name
+        handler = best_time(lambda: adapter.handler(event, None))  # noqa: B023
+        serve = best_time(lambda: app.serve(direct_request(event)))  # noqa: B023
+        print(f'{name:<16}{handler * 1e6:>14.1f}{serve * 1e6:>12.1f}{(handler - serve) * 1e6:>15.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,29 +1,41 @@
 from .core import Chasha
 from .core import Chashka
+from .core import Compression
 from .core import DI
 from .core import HttpBadRequest
 from .core import HttpError
 from .core import HttpMethodNotAllowed
 from .core import HttpNotFound
+from .core import HttpNotModified
+from .core import HttpPayloadTooLarge
 from .core import HttpRedirect
 from .core import InjectContext
 from .core import PayloadError
 from .core import QueryParamMissing
 from .core import Request
 from .core import Response
+from .core import ResponseCache
+from .core import TypeCast
+from .core import UploadFile
 
 __all__ = (
     'Chasha',
     'Chashka',
+    'Compression',
     'DI',
     'HttpBadRequest',
     'HttpError',
     'HttpMethodNotAllowed',
     'HttpNotFound',
+    'HttpNotModified',
+    'HttpPayloadTooLarge',
     'HttpRedirect',
     'InjectContext',
     'PayloadError',
     'QueryParamMissing',
     'Request',
     'Response',
+    'ResponseCache',
+    'TypeCast',
+    'UploadFile',
 )
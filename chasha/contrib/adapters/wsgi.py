@@ -1,14 +1,49 @@
 import typing
 import urllib.parse
-import email.message
 from http import HTTPStatus
-from urllib.parse import urlparse
-from chasha import Chasha, Request
+from chasha import Chasha, HttpBadRequest, HttpError, HttpPayloadTooLarge, Request
+
+
+class WSGIRequest(Request):
+    """
+    Request view of WSGI environ, query, headers and body are read on first access
+    """
+    __slots__ = ('_adapter',)
+
+    def __init__(self, environ: dict[str, typing.Any], adapter: type['WSGIAdapter']):
+        super().__init__(
+            method=environ['REQUEST_METHOD'].upper(),
+            path=adapter._get_path(environ.get('PATH_INFO', '/')),
+            raw=environ,
+        )
+        self._adapter = adapter
+
+    def _load_query(self) -> dict[str, typing.Any]:
+        return self._adapter._get_query(self.raw.get('QUERY_STRING'))
+
+    def _load_headers(self) -> dict[str, str]:
+        return self._adapter._get_headers(self.raw)
+
+    def _load_content(self) -> bytes:
+        return self._adapter._get_body(self.raw)
+
+    def _load_stream(self) -> typing.Iterator[bytes]:
+        return self._adapter._iter_body(self.raw)
 
 
 class WSGIAdapter:
+    """
+    Request body is read when the handler needs it, requests with body larger
+    than MAX_LENGTH fail with 413. Chunked body is read until the end of the input
+    when the server has decoded it (wsgi.input_terminated) or decoded by the adapter
+    """
     MAX_LENGTH = 100 * 1000 * 1000
+    CHUNK_SIZE = 64 * 1024
     HEADER_PREFIX = 'HTTP_'
+    STATUS_LINES = {status.value: f'{status.value} {status.phrase}' for status in HTTPStatus}
+    # header names of environ keys, None for keys which are not headers
+    _header_names: dict[str, str | None] = {}
+    MAX_HEADER_NAMES = 1024
 
     def __init__(self, app: Chasha):
         self.app = app
@@ -21,9 +56,9 @@ class WSGIAdapter:
         }
 
     @staticmethod
-    def _get_path(url: str):
-        result = urlparse(url)
-        return result.path
+    def _get_path(path: str):
+        # PATH_INFO is the decoded path, no query or fragment
+        return path or '/'
 
     @classmethod
     def _get_query(cls, qs: str) -> dict[str, list]:
@@ -32,62 +67,158 @@ class WSGIAdapter:
         result = urllib.parse.parse_qs(qs)
         return cls._denormalize_multi_value(result)
 
+    @classmethod
+    def _header_name(cls, key: str) -> str | None:
+        if key.startswith(cls.HEADER_PREFIX):
+            name: str | None = key[len(cls.HEADER_PREFIX):].lower().replace('_', '-')
+        else:
+            name = None
+        # names come from clients, so the cache is bounded
+        if len(cls._header_names) < cls.MAX_HEADER_NAMES:
+            cls._header_names[key] = name
+        return name
+
     @classmethod
     def _get_headers(cls, environ: dict[str, str]):
+        names = cls._header_names
         headers = {}
         for key, value in environ.items():
-            if not key.startswith(cls.HEADER_PREFIX):
-                continue
-            name = key[len(cls.HEADER_PREFIX):].lower().replace('_', '-')
-            headers[name] = value
-
+            try:
+                name = names[key]
+            except KeyError:
+                name = cls._header_name(key)
+            if name is not None:
+                headers[name] = value
+
+        # the only headers WSGI keeps without the prefix
+        if environ.get('CONTENT_TYPE'):
+            headers['content-type'] = environ['CONTENT_TYPE']
+        if environ.get('CONTENT_LENGTH'):
+            headers['content-length'] = environ['CONTENT_LENGTH']
         return headers
 
     @classmethod
-    def _parse_content_charset(cls, environ: dict[str, str]):
-        message = email.message.Message()  # whatever
-        message['content-type'] = environ.get('CONTENT_TYPE', 'text/plain')
-        params = dict(message.get_params() or ())
-        return params.get('charset', 'utf-8')
+    def _content_length(cls, environ: dict[str, typing.Any]) -> int | None:
+        value = environ.get('CONTENT_LENGTH')
+        if not value:
+            return None
+        try:
+            length = int(value)
+        except ValueError:
+            raise HttpBadRequest('Invalid Content-Length')
+        if length < 0:
+            raise HttpBadRequest('Invalid Content-Length')
+        if length > cls.MAX_LENGTH:
+            raise HttpPayloadTooLarge()
+        return length
+
+    @staticmethod
+    def _is_chunked(environ: dict[str, typing.Any]) -> bool:
+        return 'chunked' in environ.get('HTTP_TRANSFER_ENCODING', '').lower()
 
     @classmethod
-    def _get_body(cls, environ: dict[str, typing.Any]):
+    def _get_body(cls, environ: dict[str, typing.Any]) -> bytes:
         if 'wsgi.input' not in environ:
-            return ''
-        content_length = environ.get('CONTENT_LENGTH') or 0
-        if not content_length:
-            return ''
+            return b''
+        length = cls._content_length(environ)
+        if length is not None:
+            # the whole body is read at once, so it is not copied
+            return environ['wsgi.input'].read(length)
+        return b''.join(cls._iter_body(environ))
 
-        content_charset = cls._parse_content_charset(environ)
-        length = int(content_length)
-        data = environ['wsgi.input'].read(length)
-        return data.decode(content_charset)
+    @classmethod
+    def _iter_body(cls, environ: dict[str, typing.Any]) -> typing.Iterator[bytes]:
+        stream = environ.get('wsgi.input')
+        if stream is None:
+            return
+        length = cls._content_length(environ)
+        if length is not None:
+            while length > 0:
+                chunk = stream.read(min(length, cls.CHUNK_SIZE))
+                if not chunk:
+                    return
+                length -= len(chunk)
+                yield chunk
+            return
+        if not cls._is_chunked(environ):
+            return
+
+        chunks = cls._read_all(stream) if environ.get('wsgi.input_terminated') else cls._dechunk(stream)
+        total = 0
+        for chunk in chunks:
+            total += len(chunk)
+            if total > cls.MAX_LENGTH:
+                raise HttpPayloadTooLarge()
+            yield chunk
 
     @classmethod
-    def adapt_request(cls, environ):
-        request = Request(
-            method=environ['REQUEST_METHOD'].upper(),
-            query=cls._get_query(environ.get('QUERY_STRING')),
-            headers=cls._get_headers(environ),
-            path=cls._get_path(environ.get('PATH_INFO', '/')),
-            body=cls._get_body(environ),
-            raw=environ
-        )
-        return request
+    def _read_all(cls, stream: typing.BinaryIO) -> typing.Iterator[bytes]:
+        while True:
+            chunk = stream.read(cls.CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+    @classmethod
+    def _dechunk(cls, stream: typing.BinaryIO) -> typing.Iterator[bytes]:
+        while True:
+            size_line = stream.readline(1024)
+            try:
+                size = int(size_line.split(b';', 1)[0].strip(), 16)
+            except ValueError:
+                raise HttpBadRequest('Invalid chunked body')
+            if size == 0:
+                # skip trailers
+                while stream.readline(1024).strip():
+                    pass
+                return
+            while size > 0:
+                chunk = stream.read(min(size, cls.CHUNK_SIZE))
+                if not chunk:
+                    raise HttpBadRequest('Incomplete chunked body')
+                size -= len(chunk)
+                yield chunk
+            stream.readline(1024)
+
+    @classmethod
+    def adapt_request(cls, environ) -> Request:
+        return WSGIRequest(environ, adapter=cls)
 
     @classmethod
     def get_status(cls, status_code) -> str:
-        status = HTTPStatus(status_code)
-        return f'{status.value} {status.phrase}'
+        try:
+            return cls.STATUS_LINES[status_code]
+        except KeyError:
+            return f'{status_code} Unknown'
 
     def handler(self, environ, start_response) -> typing.Iterable[bytes]:
         request = self.adapt_request(environ)
-        response = self.app.serve(request)
+        try:
+            # declared length is checked before anything is read
+            self._content_length(environ)
+        except HttpError as e:
+            response = self.app.serve_error(request, e)
+        else:
+            response = self.app.serve(request)
+
+        start_response(self.get_status(response.status_code), list(response.header_items()))
+        if response.stream is not None:
+            return self._stream(response.stream)
+        return [self._to_bytes(response.content)]
 
-        headers = []
-        for key, values in response.headers:
-            for value in values:
-                headers.append((key, value))
+    @staticmethod
+    def _to_bytes(content: bytes | memoryview) -> bytes:
+        # WSGI requires bytes, memoryview is the only thing to copy
+        return content if isinstance(content, bytes) else bytes(content)
 
-        start_response(self.get_status(response.status_code), headers)
-        return [response.body.encode('latin-1')]
+    @classmethod
+    def _stream(cls, chunks: typing.Iterator[bytes | memoryview]) -> typing.Iterator[bytes]:
+        try:
+            for chunk in chunks:
+                if chunk:
+                    yield cls._to_bytes(chunk)
+        finally:
+            # server closes the iterable when the client goes away
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
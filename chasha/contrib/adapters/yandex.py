@@ -1,15 +1,110 @@
 import base64
+import functools
+import logging
+import typing
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse
-from chasha import Chasha, Request
+from chasha import Chasha, Request, Response
+
+
+LOG = logging.getLogger('chasha')
+
+
+@functools.lru_cache(maxsize=256)
+def _canonical_header(name: str) -> str:
+    # the gateway passes header names in canonical form, Content-Type, X-Real-Ip
+    return '-'.join(part.capitalize() for part in name.split('-'))
+
+
+class YandexRequest(Request):
+    """
+    Request view of the API gateway event, nothing is copied from the event:
+    headers are looked up in the event dict by canonical name, query is decoded on first access
+    and text body is used as is
+    """
+    __slots__ = ('_adapter', '_mixed_case')
+
+    def __init__(self, event: dict[str, typing.Any], adapter: type['YandexCloudAdapter']):
+        body = event.get('body')
+        super().__init__(
+            method=event['httpMethod'],
+            headers=event.get('headers'),
+            path=adapter._get_path(event['url']),
+            # base64 encoded body is decoded on first access
+            body=None if event.get('isBase64Encoded') else body,
+            raw=event,
+        )
+        self._adapter = adapter
+        # whether some header names are neither canonical nor lowercase, checked on first miss
+        self._mixed_case: bool | None = None
+
+    def _load_query(self) -> dict[str, typing.Any]:
+        return self._adapter._get_query(self.raw)
+
+    def _load_content(self) -> bytes:
+        body = self.raw.get('body')
+        if body and self.raw.get('isBase64Encoded'):
+            return base64.b64decode(body)
+        return b''
+
+    def get_header(self, name: str, default: str | None = None) -> str | None:
+        headers = self._raw_headers
+        if not headers:
+            return default
+        value = headers.get(_canonical_header(name))
+        if value is None:
+            # events built by hand or by HTTP/2 clients
+            value = headers.get(name.lower())
+        if value is not None:
+            return value
+
+        if self._mixed_case is None:
+            self._mixed_case = any(key != _canonical_header(key) and key != key.lower() for key in headers)
+        if self._mixed_case:
+            # names in other case are found in lowercased copy of the headers
+            return super().get_header(name, default)
+        return default
+
+    @property
+    def headers(self) -> typing.Iterable[tuple[str, str]]:
+        for key, value in (self._raw_headers or {}).items():
+            yield key.lower(), value
+
+
+class TriggerBatchError(Exception):
+    """
+    Raised after the batch of trigger messages when some of them failed, so the trigger delivers the batch again
+    """
+    def __init__(self, failures: list[dict[str, typing.Any]]):
+        super().__init__(f'Failed to process {len(failures)} trigger messages')
+        self.failures = failures
 
 
 class YandexCloudAdapter:
     """
     Adapter for Yandex Cloud Functions
-    Binary response is not supported
+    Async handlers run on the event loop which is kept alive between warm invocations
+    Streaming responses are buffered up to MAX_BODY_SIZE
+
+    Message queue and timer trigger messages are served as POST requests on QUEUE_PATH and TIMER_PATH
+    or on the paths given in trigger_routes by queue name or timer trigger id.
+    Messages of the batch are served one by one or by up to concurrency threads.
+    With raise_on_failure the invocation fails when any message fails, so the whole batch is delivered again
     """
-    def __init__(self, app: Chasha):
+    MAX_BODY_SIZE = 3 * 1024 * 1024 + 512 * 1024
+    QUEUE_MESSAGE = 'yandex.cloud.events.messagequeue.QueueMessage'
+    TIMER_MESSAGE = 'yandex.cloud.events.serverless.triggers.TimerMessage'
+    QUEUE_PATH = '/queue/{name}'
+    TIMER_PATH = '/timer/{name}'
+
+    def __init__(self, app: Chasha, trigger_routes: dict[str, str] | None = None, concurrency: int = 1,
+                 raise_on_failure: bool = False):
         self.app = app
+        self.trigger_routes = trigger_routes or {}
+        self.concurrency = concurrency
+        self.raise_on_failure = raise_on_failure
+        # threads are kept between warm invocations like the event loop
+        self._executor: ThreadPoolExecutor | None = None
 
     @staticmethod
     def _denormalize_multi_value(dikt: dict[str, list]):
@@ -18,49 +113,152 @@ class YandexCloudAdapter:
             for key, value in dikt.items()
         }
 
+    @classmethod
+    def _get_query(cls, event: dict[str, typing.Any]) -> dict[str, typing.Any]:
+        multi = event.get('multiValueQueryStringParameters')
+        if not multi:
+            return event.get('queryStringParameters') or {}
+        single = event.get('queryStringParameters')
+        if single is not None and all(len(values) == 1 for values in multi.values()):
+            # the same values, already in the form handlers expect
+            return single
+        return cls._denormalize_multi_value(multi)
+
     @staticmethod
     def _get_path(url: str):
-        result = urlparse(url)
-        return result.path
+        # event path is the route template of the gateway, request path is taken from url
+        if url.startswith('/'):
+            return url.partition('?')[0]
+        return urlparse(url).path
 
     @classmethod
-    def adapt_request(cls, event):
-        body = event.get('body', '')
-        if body and event.get('isBase64Encoded'):
-            body = base64.b64decode(body).decode('utf-8')
+    def adapt_request(cls, event) -> Request:
+        return YandexRequest(event, adapter=cls)
 
-        request = Request(
-            method=event['httpMethod'],
-            query=cls._denormalize_multi_value(event.get('multiValueQueryStringParameters', {})),
-            headers=event.get('headers', {}),
-            path=cls._get_path(event['url']),
-            body=body,
-            raw=event
-        )
-        return request
+    @classmethod
+    def _buffer_stream(cls, response: Response) -> bool:
+        stream = response.stream
+        assert stream is not None
+        buffer = bytearray()
+        try:
+            for chunk in stream:
+                buffer += chunk
+                if len(buffer) > cls.MAX_BODY_SIZE:
+                    LOG.error(f'Streaming response exceeds {cls.MAX_BODY_SIZE} bytes')
+                    return False
+        except Exception as e:
+            LOG.exception(f'Failed to read streaming response {e}')
+            return False
+        finally:
+            close = getattr(stream, 'close', None)
+            if close is not None:
+                close()
+
+        data = bytes(buffer)
+        try:
+            response.body = data.decode(response.charset)
+        except UnicodeDecodeError:
+            response.content = data
+            response.is_binary = True
+        return True
 
     @classmethod
     def adapt_response(cls, response):
+        if response.stream is not None and not cls._buffer_stream(response):
+            response = Response(status_code=500)
+
         headers = {}
         m_headers = {}
 
-        for key, values in response.headers:
-            if len(values) > 1:
-                m_headers[key] = values
+        for key, values in response.header_values():
+            if isinstance(values, str):
+                headers[key] = values
             else:
-                headers[key] = values[0]
+                m_headers[key] = values
+
+        if response.is_binary:
+            body = base64.b64encode(response.content).decode('ascii')
+        else:
+            body = response.body
 
         result = {
             'statusCode': response.status_code,
-            'body': response.body,
+            'body': body,
             'headers': headers,
             'multiValueHeaders': m_headers,
-            'isBase64Encoded': False,
+            'isBase64Encoded': response.is_binary,
         }
 
         return result
 
+    def _trigger_request(self, message: dict[str, typing.Any]) -> Request:
+        event_type = message['event_metadata']['event_type']
+        details = message['details']
+        if event_type == self.QUEUE_MESSAGE:
+            # queue id is yrn:yc:ymq:<region>:<folder>:<name>
+            name = details['queue_id'].rsplit(':', 1)[-1]
+            path = self.QUEUE_PATH
+            body = details['message'].get('body', '')
+        elif event_type == self.TIMER_MESSAGE:
+            name = details['trigger_id']
+            path = self.TIMER_PATH
+            body = details.get('payload', '')
+        else:
+            raise ValueError(f'Unsupported trigger event {event_type}')
+
+        return Request(
+            method='POST',
+            path=self.trigger_routes.get(name) or path.format(name=name),
+            query={},
+            headers={},
+            body=body,
+            raw=message,
+        )
+
+    @staticmethod
+    def _message_id(message: dict[str, typing.Any]) -> str | None:
+        queue_message = message.get('details', {}).get('message')
+        if queue_message is not None:
+            return queue_message.get('message_id')
+        return message.get('event_metadata', {}).get('event_id')
+
+    def _serve_message(self, message: dict[str, typing.Any]) -> dict[str, typing.Any] | None:
+        """
+        Serves the trigger message, returns the failure or None when the message is processed
+        """
+        try:
+            response = self.adapt_response(self.app.serve(self._trigger_request(message)))
+        except Exception as e:
+            LOG.exception(f'Failed to process trigger message {e}')
+            response = {'statusCode': 500, 'body': str(e)}
+        if response['statusCode'] < 400:
+            return None
+        return {'id': self._message_id(message), 'statusCode': response['statusCode'], 'body': response['body']}
+
+    def handle_messages(self, messages: list[dict[str, typing.Any]]) -> dict[str, typing.Any]:
+        """
+        Serves the batch of trigger messages, failures are reported in the order of the batch
+        or raised with TriggerBatchError when raise_on_failure is set
+        """
+        if self.concurrency > 1 and len(messages) > 1:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.concurrency)
+            results = list(self._executor.map(self._serve_message, messages))
+        else:
+            results = [self._serve_message(message) for message in messages]
+
+        failures = [result for result in results if result is not None]
+        if failures and self.raise_on_failure:
+            raise TriggerBatchError(failures)
+        return {
+            'processed': len(messages) - len(failures),
+            'failures': failures,
+        }
+
     def handler(self, event, _):
+        if 'httpMethod' not in event and 'messages' in event:
+            return self.handle_messages(event['messages'])
+
         request = self.adapt_request(event)
         response = self.app.serve(request)
         return self.adapt_response(response)
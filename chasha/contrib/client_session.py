@@ -1,8 +1,12 @@
 import base64
+import functools
 import hmac
 import hashlib
 import json
 import secrets
+import threading
+import typing
+from collections import OrderedDict
 
 from chasha import DI
 
@@ -11,13 +15,21 @@ class BadSignature(Exception):
     pass
 
 
-def _signature(value: str, *, secret: str) -> str:
+@functools.lru_cache(maxsize=16)
+def _signer(secret: str) -> hmac.HMAC:
+    # key derivation and HMAC key setup are done once per secret, the prototype is copied per signature
     hasher = hashlib.sha256
     secret_bytes = secret.encode('ascii')
+    key = hasher(secret_bytes).digest()
+    return hmac.new(key, digestmod=hasher)
+
+
+def _signature(value: str, *, secret: str) -> str:
     value_bytes = value.encode('utf-8')
 
-    key = hasher(secret_bytes).digest()
-    signature: bytes = hmac.new(key, msg=value_bytes, digestmod=hasher).digest()
+    signer = _signer(secret).copy()
+    signer.update(value_bytes)
+    signature: bytes = signer.digest()
 
     b64_signature: str = base64.b64encode(signature).decode('ascii')
     return b64_signature
@@ -52,29 +64,109 @@ def verify_dict(signed: str, *, secret: str) -> dict:
     return json.loads(value)
 
 
+class SessionData(dict):
+    """
+    Session dict which tracks its changes, changes of nested values
+    are not seen, set modified to save them
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.modified = False
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.modified = True
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.modified = True
+
+    def __ior__(self, other):  # type: ignore[misc]
+        self.update(other)
+        return self
+
+    def clear(self):
+        super().clear()
+        self.modified = True
+
+    def pop(self, *args):
+        self.modified = True
+        return super().pop(*args)
+
+    def popitem(self):
+        self.modified = True
+        return super().popitem()
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self.modified = True
+        return super().setdefault(key, default)
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self.modified = True
+
+
+def _copy_json(value: typing.Any) -> typing.Any:
+    if isinstance(value, dict):
+        return {key: _copy_json(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy_json(item) for item in value]
+    return value
+
+
 class Session:
-    def __init__(self, secret: str, cookie: str = 'chasha_contrib_session'):
+    def __init__(self, secret: str, cookie: str = 'chasha_contrib_session', cache_size: int = 256):
+        """
+        :param cache_size: number of recently verified cookies kept to skip their verification
+        """
         self.__secret = secret
         self.__cookie_name = cookie
+        self.cache_size = cache_size
+        self._verified: OrderedDict[str, dict] = OrderedDict()
+        self._verified_lock = threading.Lock()
+
+    def _verify(self, signed_session: str) -> dict:
+        with self._verified_lock:
+            data = self._verified.get(signed_session)
+            if data is not None:
+                self._verified.move_to_end(signed_session)
+        if data is None:
+            data = verify_dict(signed_session, secret=self.__secret)
+            self._remember(signed_session, data)
+        # the cached value is never given to the handler
+        return _copy_json(data)
+
+    def _remember(self, signed_session: str, data: dict):
+        if not self.cache_size:
+            return
+        with self._verified_lock:
+            self._verified[signed_session] = _copy_json(data)
+            if len(self._verified) > self.cache_size:
+                self._verified.popitem(last=False)
 
     def _session(self, cookies: DI.Cookies = DI.cookies()):
         signed_session = cookies.get(self.__cookie_name)
-        data = {}
+        data = SessionData()
         try:
             if signed_session:
-                data = verify_dict(signed_session, secret=self.__secret)
+                data = SessionData(self._verify(signed_session))
         except Exception:
-            data = {}
+            data = SessionData()
 
         yield data
-        new_signed_session = sign_dict(data, secret=self.__secret)
-
+        if not data.modified:
+            return
         if not data and signed_session is None:
             return
+
+        new_signed_session = sign_dict(data, secret=self.__secret)
         if new_signed_session == signed_session:
             return
 
         cookies.set(self.__cookie_name, new_signed_session)
+        # the next request is likely to come with the new cookie
+        self._remember(new_signed_session, data)
 
     def inject(self):
         return DI.inject(self._session)
@@ -0,0 +1,218 @@
+import abc
+import collections.abc
+import json
+import os
+import re
+import secrets
+import sqlite3
+import tempfile
+import threading
+import typing
+from collections import OrderedDict
+
+from chasha import DI
+from chasha.contrib.client_session import sign_str, verify_str
+
+
+class SessionStore(abc.ABC):
+    """
+    Storage of server side sessions, data is passed as JSON compatible dict
+    """
+    @abc.abstractmethod
+    def load(self, session_id: str) -> dict | None:
+        pass
+
+    @abc.abstractmethod
+    def save(self, session_id: str, data: dict):
+        pass
+
+    @abc.abstractmethod
+    def delete(self, session_id: str):
+        pass
+
+
+class MemoryStore(SessionStore):
+    """
+    Keeps sessions in process memory, least recently used sessions are dropped
+    """
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        # serialized data, so stored sessions are not changed by handlers
+        self._sessions: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, session_id: str) -> dict | None:
+        with self._lock:
+            data = self._sessions.get(session_id)
+            if data is None:
+                return None
+            self._sessions.move_to_end(session_id)
+        return json.loads(data)
+
+    def save(self, session_id: str, data: dict):
+        serialized = json.dumps(data)
+        with self._lock:
+            self._sessions[session_id] = serialized
+            self._sessions.move_to_end(session_id)
+            if len(self._sessions) > self.max_entries:
+                self._sessions.popitem(last=False)
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+class SQLiteStore(SessionStore):
+    """
+    Keeps sessions in SQLite database file, connection is opened per thread
+    """
+    def __init__(self, path: str, table: str = 'sessions'):
+        if not re.fullmatch('[A-Za-z_][A-Za-z0-9_]*', table):
+            raise ValueError(f'Invalid table name {table}')
+        self.path = path
+        self.table = table
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.execute(f'CREATE TABLE IF NOT EXISTS {table} (id TEXT PRIMARY KEY, data TEXT NOT NULL)')
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = sqlite3.connect(self.path)
+        return connection
+
+    def load(self, session_id: str) -> dict | None:
+        row = self._connection().execute(f'SELECT data FROM {self.table} WHERE id = ?', (session_id,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def save(self, session_id: str, data: dict):
+        with self._connection() as connection:
+            connection.execute(
+                f'INSERT OR REPLACE INTO {self.table} (id, data) VALUES (?, ?)', (session_id, json.dumps(data))
+            )
+
+    def delete(self, session_id: str):
+        with self._connection() as connection:
+            connection.execute(f'DELETE FROM {self.table} WHERE id = ?', (session_id,))
+
+
+class DirectoryStore(SessionStore):
+    """
+    Keeps every session in its own JSON file, files are replaced atomically
+    """
+    SESSION_ID = re.compile('[A-Za-z0-9_-]+')
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, session_id: str) -> str:
+        if not self.SESSION_ID.fullmatch(session_id):
+            raise ValueError('Invalid session id')
+        return os.path.join(self.path, f'{session_id}.json')
+
+    def load(self, session_id: str) -> dict | None:
+        try:
+            with open(self._file(session_id), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, session_id: str, data: dict):
+        fd, temp_path = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(temp_path, self._file(session_id))
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def delete(self, session_id: str):
+        try:
+            os.unlink(self._file(session_id))
+        except FileNotFoundError:
+            pass
+
+
+class ServerSessionData(collections.abc.MutableMapping):
+    """
+    Session data loaded from the store on first access, top level changes are tracked,
+    set modified to save changes of nested values
+    """
+    def __init__(self, store: SessionStore, session_id: str | None):
+        self.session_id = session_id
+        self.modified = False
+        self._store = store
+        self._data: dict | None = None if session_id is not None else {}
+
+    @property
+    def data(self) -> dict:
+        if self._data is None:
+            assert self.session_id is not None
+            self._data = self._store.load(self.session_id) or {}
+        return self._data
+
+    def __getitem__(self, key: str) -> typing.Any:
+        return self.data[key]
+
+    def __setitem__(self, key: str, value: typing.Any):
+        self.data[key] = value
+        self.modified = True
+
+    def __delitem__(self, key: str):
+        del self.data[key]
+        self.modified = True
+
+    def __iter__(self) -> typing.Iterator[str]:
+        return iter(self.data)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({self.data!r})'
+
+
+class ServerSession:
+    """
+    Session kept in the store, the cookie holds only signed session id.
+    Data is loaded on first access and written back once after the handler when it is changed
+    """
+    def __init__(self, secret: str, store: SessionStore, cookie: str = 'chasha_contrib_session_id'):
+        self.__secret = secret
+        self.__cookie_name = cookie
+        self.store = store
+
+    def _session_id(self, signed_session_id: str | None) -> str | None:
+        if not signed_session_id:
+            return None
+        try:
+            return verify_str(signed_session_id, secret=self.__secret)
+        except Exception:
+            return None
+
+    def _session(self, cookies: DI.Cookies = DI.cookies()):
+        session_id = self._session_id(cookies.get(self.__cookie_name))
+        data = ServerSessionData(self.store, session_id)
+
+        yield data
+        if not data.modified:
+            return
+
+        if data.session_id is None:
+            if not data:
+                return
+            data.session_id = secrets.token_urlsafe(32)
+            signed_session_id = sign_str(data.session_id, secret=self.__secret)
+            cookies.set(self.__cookie_name, signed_session_id, http_only=True, same_site='Lax')
+
+        if data:
+            self.store.save(data.session_id, dict(data))
+        else:
+            self.store.delete(data.session_id)
+
+    def inject(self):
+        return DI.inject(self._session)
@@ -1,13 +1,30 @@
+import asyncio
+import collections.abc
+import datetime
+import email.utils
+import functools
+import hashlib
 import inspect
 import json
 import logging
 import types
 import typing
 import re
+import string
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
 import uuid
+import zlib
 from dataclasses import dataclass
-from collections import defaultdict
-from http.cookies import SimpleCookie
+from collections import OrderedDict
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore
 
 
 LOG = logging.getLogger('chasha')
@@ -63,6 +80,11 @@ class PayloadError(HttpBadRequest):
         }
 
 
+class HttpPayloadTooLarge(HttpError):
+    MESSAGE = 'Payload Too Large'
+    STATUS_CODE = 413
+
+
 class HttpRedirect(HttpError):
     MESSAGE = 'Redirect'
     STATUS_CODE = 307
@@ -72,6 +94,15 @@ class HttpRedirect(HttpError):
         self.to = redirect_to
 
 
+class HttpNotModified(HttpError):
+    MESSAGE = 'Not Modified'
+    STATUS_CODE = 304
+
+    def __init__(self, headers: dict[str, str] | None = None, message: str = ''):
+        super().__init__(message)
+        self.headers = headers or {}
+
+
 EMPTY = object()
 
 
@@ -79,109 +110,1063 @@ class _HtmlBody(str):
     pass
 
 
+JsonDumps = typing.Callable[[typing.Any], bytes]
+
+_json_encoder = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False, check_circular=False)
+_json_ascii_encoder = json.JSONEncoder(separators=(',', ':'), check_circular=False)
+
+
+def std_json_dumps(value: typing.Any) -> bytes:
+    try:
+        return _json_encoder.encode(value).encode('utf-8')
+    except UnicodeEncodeError:
+        # lone surrogates can not be encoded to utf-8, escaped they are still valid JSON
+        return _json_ascii_encoder.encode(value).encode('ascii')
+
+
+def orjson_dumps(value: typing.Any) -> bytes:
+    try:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+    except TypeError:
+        # e.g. integers out of 64 bit range, stdlib is less strict
+        return std_json_dumps(value)
+
+
+default_json_dumps: JsonDumps = orjson_dumps if orjson is not None else std_json_dumps
+
+
+class _JsonStream:
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, items: typing.Iterable):
+        self.items = items
+
+    def chunks(self, json_dumps: JsonDumps) -> typing.Iterator[bytes]:
+        # items are serialized one by one and sent in chunks of roughly the same size
+        buffer = bytearray(b'[')
+        try:
+            for index, item in enumerate(self.items):
+                if index:
+                    buffer += b','
+                buffer += json_dumps(item)
+                if len(buffer) >= self.CHUNK_SIZE:
+                    yield bytes(buffer)
+                    buffer.clear()
+        finally:
+            _close_iterator(self.items)
+        buffer += b']'
+        yield bytes(buffer)
+
+
+def _close_iterator(iterator: typing.Any):
+    close = getattr(iterator, 'close', None)
+    if close is not None:
+        close()
+
+
+class _ClosingIterator:
+    """
+    Iterator calling on_close once it is exhausted, fails or is closed
+    """
+    __slots__ = ('_iterator', '_on_close')
+
+    def __init__(self, iterator: typing.Iterator, on_close: typing.Callable[[bool], None]):
+        self._iterator = iterator
+        self._on_close: typing.Callable[[bool], None] | None = on_close
+
+    def __iter__(self) -> '_ClosingIterator':
+        return self
+
+    def __next__(self) -> typing.Any:
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            self._close(failed=False)
+            raise
+        except BaseException:
+            self._close(failed=True)
+            raise
+
+    def close(self):
+        self._close(failed=False)
+
+    def _close(self, failed: bool):
+        on_close = self._on_close
+        if on_close is None:
+            return
+        self._on_close = None
+        try:
+            _close_iterator(self._iterator)
+        finally:
+            on_close(failed)
+
+
+@functools.lru_cache(maxsize=256)
+def parse_content_type(value: str) -> tuple[str, dict[str, str]]:
+    """
+    Splits content type header into lowercase mime type and its parameters
+    """
+    mime_type, *params = value.split(';')
+    parsed = {}
+    for param in params:
+        name, _, param_value = param.partition('=')
+        parsed[name.strip().lower()] = param_value.strip().strip('"')
+    return mime_type.strip().lower(), parsed
+
+
+_COOKIE_LEGAL_CHARS = string.ascii_letters + string.digits + "!#$%&'*+-.^_`|~:"
+_is_legal_cookie = re.compile(f'[{re.escape(_COOKIE_LEGAL_CHARS)}]+').fullmatch
+# the same escaping as http.cookies uses, so values are read back by any cookie parser
+_COOKIE_QUOTE_TABLE = {
+    code: f'\\{code:03o}' for code in range(256) if chr(code) not in _COOKIE_LEGAL_CHARS + ' ()/<=>?@[]{}'
+}
+_COOKIE_QUOTE_TABLE.update({ord('"'): '\\"', ord('\\'): '\\\\'})
+_COOKIE_ESCAPE = re.compile(r'\\(?:([0-7]{3})|(.))')
+_COOKIE_QUOTED = re.compile(r'"(?:[^"\\]|\\.)*"')
+COOKIE_SAME_SITE = ('Strict', 'Lax', 'None')
+
+
+def quote_cookie_value(value: str) -> str:
+    if _is_legal_cookie(value):
+        return value
+    return '"' + value.translate(_COOKIE_QUOTE_TABLE) + '"'
+
+
+def unquote_cookie_value(value: str) -> str:
+    if len(value) < 2 or value[0] != '"' or value[-1] != '"':
+        return value
+    value = value[1:-1]
+    if '\\' not in value:
+        return value
+    return _COOKIE_ESCAPE.sub(lambda match: chr(int(match[1], 8)) if match[1] else match[2], value)
+
+
+def parse_cookies(header: str) -> dict[str, str]:
+    """
+    Parses Cookie request header, malformed pairs are skipped instead of dropping the whole header
+    """
+    cookies = {}
+    for pair in header.split(';'):
+        name, separator, value = pair.partition('=')
+        name = name.strip()
+        if not separator or not name:
+            continue
+        value = value.strip()
+        if value.startswith('"'):
+            # anything after the quoted value is garbage
+            quoted = _COOKIE_QUOTED.match(value)
+            if quoted is not None:
+                value = quoted[0]
+        cookies[name] = unquote_cookie_value(value)
+    return cookies
+
+
+@functools.lru_cache(maxsize=64)
+def _cookie_attributes(path: str | None, max_age: int | None, http_only: bool | None,
+                       same_site: str | None, secure: bool | None) -> str:
+    # attributes are in the order of http.cookies output
+    attributes = []
+    if http_only:
+        attributes.append('; HttpOnly')
+    if max_age is not None:
+        attributes.append(f'; Max-Age={max_age}')
+    if path is not None:
+        attributes.append(f'; Path={path}')
+    if same_site is not None:
+        if same_site not in COOKIE_SAME_SITE:
+            raise ValueError(f'SameSite should be one of {", ".join(COOKIE_SAME_SITE)}')
+        attributes.append(f'; SameSite={same_site}')
+    if secure:
+        attributes.append('; Secure')
+    return ''.join(attributes)
+
+
+def format_cookie(name: str, value: str,
+                  path: str | None = None,
+                  max_age: int | None = None,
+                  http_only: bool | None = None,
+                  same_site: str | None = None,
+                  secure: bool | None = None) -> str:
+    """
+    Serializes the value of Set-Cookie response header
+    """
+    if not _is_legal_cookie(name):
+        raise ValueError(f'Illegal cookie name {name!r}')
+    attributes = _cookie_attributes(path, max_age, http_only, same_site, secure)
+    return f'{name}={quote_cookie_value(value)}{attributes}'
+
+
+_HEADER_PARAM = re.compile(r';\s*([^\s=;]+)\s*=\s*("(?:[^"\\]|\\.)*"|[^;]*)')
+
+
+def parse_header_params(value: str) -> tuple[str, dict[str, str]]:
+    """
+    Splits header like Content-Disposition into value and parameters, quoted parameters may contain ;
+    """
+    main, _, rest = value.partition(';')
+    params = {}
+    for match in _HEADER_PARAM.finditer(';' + rest):
+        param = match[2].strip()
+        if len(param) >= 2 and param[0] == '"' and param[-1] == '"':
+            param = re.sub(r'\\(.)', r'\1', param[1:-1])
+        params[match[1].lower()] = param
+    return main.strip().lower(), params
+
+
+class UploadFile:
+    """
+    File of multipart form, content is kept in memory until it exceeds
+    the size limit and moved to temporary file after that
+    """
+    def __init__(self, name: str, filename: str, content_type: str, max_memory_size: int):
+        self.name = name
+        self.filename = filename
+        self.content_type = content_type
+        self.size = 0
+        self.in_memory = True
+        self.file = tempfile.SpooledTemporaryFile(max_size=max_memory_size)
+        self._max_memory_size = max_memory_size
+
+    def write(self, data: bytes | bytearray):
+        self.file.write(data)
+        self.size += len(data)
+        if self.size > self._max_memory_size:
+            # spooled file has moved the content to the disk
+            self.in_memory = False
+
+    def rollover(self):
+        """
+        Moves the content to temporary file
+        """
+        self.file.rollover()
+        self.in_memory = False
+
+    def read(self, size: int = -1) -> bytes:
+        return self.file.read(size)
+
+    def seek(self, offset: int):
+        self.file.seek(offset)
+
+    def close(self):
+        self.file.close()
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}(name={self.name!r}, filename={self.filename!r}, size={self.size})'
+
+
+class MultipartParser:
+    """
+    Incremental multipart/form-data parser, the body is fed in chunks as it is read.
+    Fields are kept in memory up to max_field_size each and max_fields_size in total,
+    files are spooled to disk after max_memory_size, or once files kept in memory
+    take max_total_memory_size. Number of fields and files is limited by max_fields and max_files
+    """
+    MAX_HEADERS_SIZE = 16 * 1024
+
+    def __init__(self, boundary: str, charset: str = 'utf-8',
+                 max_memory_size: int = 1024 * 1024,
+                 max_field_size: int = 1024 * 1024,
+                 max_total_memory_size: int = 4 * 1024 * 1024,
+                 max_fields_size: int = 4 * 1024 * 1024,
+                 max_fields: int = 1000,
+                 max_files: int = 100):
+        self.charset = charset
+        self.max_memory_size = max_memory_size
+        self.max_field_size = max_field_size
+        self.max_total_memory_size = max_total_memory_size
+        self.max_fields_size = max_fields_size
+        self.max_fields = max_fields
+        self.max_files = max_files
+        # bytes held in memory by files and fields of the whole body
+        self._files_memory_size = 0
+        self._fields_size = 0
+        self._fields_count = 0
+        self._files_count = 0
+        self.fields: dict[str, typing.Any] = {}
+        self.files: dict[str, typing.Any] = {}
+        self._boundary = b'--' + boundary.encode('latin-1')
+        self._delimiter = b'\r\n' + self._boundary
+        self._buffer = bytearray()
+        # parsing step for the current state, returns False when more data is needed
+        self._step: typing.Callable[[], bool] = self._read_preamble
+        self._done = False
+        self._part: UploadFile | tuple[str, bytearray] | None = None
+
+    @staticmethod
+    def _add(values: dict[str, typing.Any], name: str, value: typing.Any):
+        # single values are not wrapped in lists like in query
+        if name not in values:
+            values[name] = value
+        elif isinstance(values[name], list):
+            values[name].append(value)
+        else:
+            values[name] = [values[name], value]
+
+    def feed(self, data: bytes):
+        self._buffer += data
+        while self._step():
+            pass
+
+    def close(self):
+        if not self._done:
+            raise PayloadError('Incomplete multipart body')
+
+    def _read_preamble(self) -> bool:
+        buffer = self._buffer
+        index = buffer.find(self._boundary)
+        if index < 0:
+            # the boundary may start at the end of the buffer
+            del buffer[:max(0, len(buffer) - len(self._boundary))]
+            return False
+        del buffer[:index + len(self._boundary)]
+        self._step = self._read_boundary_end
+        return True
+
+    def _read_boundary_end(self) -> bool:
+        buffer = self._buffer
+        if len(buffer) < 2:
+            return False
+        if buffer[:2] == b'--':
+            self._done = True
+            self._step = self._read_epilogue
+            return True
+        if buffer[:2] != b'\r\n':
+            raise PayloadError('Invalid multipart boundary')
+        del buffer[:2]
+        self._step = self._read_headers
+        return True
+
+    def _read_headers(self) -> bool:
+        buffer = self._buffer
+        index = buffer.find(b'\r\n\r\n')
+        if index < 0:
+            if len(buffer) > self.MAX_HEADERS_SIZE:
+                raise PayloadError('Multipart headers are too large')
+            return False
+        self._start_part(bytes(buffer[:index]).decode(self.charset, 'replace'))
+        del buffer[:index + 4]
+        self._step = self._read_body
+        return True
+
+    def _read_body(self) -> bool:
+        buffer = self._buffer
+        index = buffer.find(self._delimiter)
+        if index < 0:
+            # keep the tail which may be the beginning of the delimiter
+            safe = len(buffer) - len(self._delimiter) + 1
+            if safe > 0:
+                self._write(buffer[:safe])
+                del buffer[:safe]
+            return False
+        self._write(buffer[:index])
+        del buffer[:index + len(self._delimiter)]
+        self._finish_part()
+        self._step = self._read_boundary_end
+        return True
+
+    def _read_epilogue(self) -> bool:
+        self._buffer.clear()
+        return False
+
+    def _start_part(self, raw_headers: str):
+        headers = {}
+        for line in raw_headers.split('\r\n'):
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        disposition, params = parse_header_params(headers.get('content-disposition', ''))
+        if disposition != 'form-data' or 'name' not in params:
+            raise PayloadError('Invalid multipart part')
+        if 'filename' in params:
+            self._files_count += 1
+            if self._files_count > self.max_files:
+                raise HttpPayloadTooLarge('Too many files in multipart form')
+            content_type = headers.get('content-type', 'application/octet-stream')
+            self._part = UploadFile(params['name'], params['filename'], content_type, self.max_memory_size)
+        else:
+            self._fields_count += 1
+            if self._fields_count > self.max_fields:
+                raise HttpPayloadTooLarge('Too many fields in multipart form')
+            self._part = (params['name'], bytearray())
+
+    def _write(self, data: bytearray):
+        if not data:
+            return
+        if isinstance(self._part, UploadFile):
+            self._write_file(self._part, data)
+            return
+        assert self._part is not None
+        value = self._part[1]
+        if len(value) + len(data) > self.max_field_size:
+            raise HttpPayloadTooLarge(f"Form field '{self._part[0]}' is too large")
+        self._fields_size += len(data)
+        if self._fields_size > self.max_fields_size:
+            raise HttpPayloadTooLarge('Form fields are too large')
+        value += data
+
+    def _write_file(self, upload: UploadFile, data: bytearray):
+        in_memory = upload.in_memory
+        if in_memory and self._files_memory_size + len(data) > self.max_total_memory_size:
+            # memory of the request is used up, so this and the following files go to the disk
+            upload.rollover()
+        upload.write(data)
+        if not in_memory:
+            return
+        if upload.in_memory:
+            self._files_memory_size += len(data)
+        else:
+            # bytes kept in memory before the file was moved
+            self._files_memory_size -= upload.size - len(data)
+
+    def _finish_part(self):
+        part, self._part = self._part, None
+        if isinstance(part, UploadFile):
+            part.seek(0)
+            self._add(self.files, part.name, part)
+        elif part is not None:
+            name, value = part
+            self._add(self.fields, name, bytes(value).decode(self.charset))
+
+    def cleanup(self):
+        if isinstance(self._part, UploadFile):
+            self._part.close()
+        _close_files(self.files)
+
+
+def _close_files(files: dict[str, typing.Any]):
+    for value in files.values():
+        for upload in value if isinstance(value, list) else [value]:
+            upload.close()
+
+
 class Request:
+    """
+    Keeps the data as provided by the adapter, headers, cookies, query and body
+    are parsed on first access. Adapters can override _load_* methods to read them lazily
+    """
+    __slots__ = (
+        'method', 'path', 'raw', '_query', '_raw_headers', '_headers', '_cookies', '_body', '_content', '_json',
+        '_form', '_files', '_streamed',
+    )
+    # uploaded files larger than this are moved from memory to temporary files,
+    # as well as all files after the files kept in memory take MAX_FORM_MEMORY_SIZE
+    MAX_MEMORY_FILE_SIZE = 1024 * 1024
+    MAX_FORM_MEMORY_SIZE = 4 * 1024 * 1024
+    MAX_FORM_FIELD_SIZE = 1024 * 1024
+    MAX_FORM_FIELDS_SIZE = 4 * 1024 * 1024
+    MAX_FORM_FIELDS = 1000
+    MAX_FORM_FILES = 100
+
     def __init__(self, method: str,
-                 query: dict[str, list[str]],
-                 headers: dict[str, str],
+                 query: dict[str, typing.Any] | None = None,
+                 headers: dict[str, str] | None = None,
                  path: str = '/',
-                 body: str = '',
+                 body: str | bytes | None = None,
                  raw: typing.Any = None):
         self.method = method
-        self.query = query
         self.path = path
-        self.body = body
         self.raw = raw
-        self._headers: dict[str, str] = {
-            key.lower(): value for key, value in headers.items()
-        }
-        self._cookies: SimpleCookie = SimpleCookie()
-        cookies = self._headers.get('cookie')
-        if cookies:
-            self._cookies.load(cookies)
+        self._query = query
+        self._raw_headers = headers
+        self._headers: dict[str, str] | None = None
+        self._cookies: dict[str, str] | None = None
+        self._body: str | None = body if isinstance(body, str) else None
+        self._content: bytes | None = body if isinstance(body, bytes) else None
+        self._json: typing.Any = EMPTY
+        self._form: dict[str, typing.Any] | None = None
+        self._files: dict[str, typing.Any] | None = None
+        self._streamed = False
+
+    def _load_query(self) -> dict[str, typing.Any]:
+        return {}
+
+    def _load_headers(self) -> dict[str, str]:
+        return {key.lower(): value for key, value in (self._raw_headers or {}).items()}
+
+    def _load_content(self) -> bytes:
+        return b''
+
+    def _load_stream(self) -> typing.Iterator[bytes]:
+        yield self._load_content()
+
+    @property
+    def query(self) -> dict[str, typing.Any]:
+        if self._query is None:
+            self._query = self._load_query()
+        return self._query
+
+    @query.setter
+    def query(self, value: dict[str, typing.Any]):
+        self._query = value
 
     def get_header(self, name: str, default: str | None = None) -> str | None:
+        if self._headers is None:
+            self._headers = self._load_headers()
         return self._headers.get(name.lower(), default)
 
     @property
     def headers(self) -> typing.Iterable[tuple[str, str]]:
+        if self._headers is None:
+            self._headers = self._load_headers()
         yield from self._headers.items()
 
     def get_cookie(self, name: str) -> str | None:
-        if name not in self._cookies:
-            return None
-        return self._cookies[name].value
+        if self._cookies is None:
+            cookies = self.get_header('cookie')
+            self._cookies = parse_cookies(cookies) if cookies else {}
+        return self._cookies.get(name)
+
+    @property
+    def charset(self) -> str:
+        content_type = self.get_header('content-type')
+        if not content_type:
+            return 'utf-8'
+        return parse_content_type(content_type)[1].get('charset', 'utf-8')
+
+    @property
+    def body(self) -> str:
+        if self._body is None:
+            self._body = self.content.decode(self.charset)
+            # only one form of the large body is kept
+            self._content = None
+        return self._body
+
+    @body.setter
+    def body(self, value: str):
+        self._body = value
+        self._content = None
+        self._json = EMPTY
+        self._form = None
+
+    @property
+    def content(self) -> bytes:
+        if self._content is None:
+            if self._body is not None:
+                self._content = self._body.encode(self.charset)
+            elif self._streamed:
+                raise RuntimeError('Request body has been read as stream')
+            else:
+                self._content = self._load_content()
+        return self._content
+
+    def stream(self) -> typing.Iterator[bytes]:
+        """
+        Body chunks as they are read, the body is not kept and can not be read again
+        """
+        if self._content is not None or self._body is not None:
+            yield self.content
+            return
+        if self._streamed:
+            raise RuntimeError('Request body has been read as stream')
+        self._streamed = True
+        yield from self._load_stream()
+
+    def json(self) -> typing.Any:
+        """
+        Body parsed as JSON, parsed value is kept for the following calls
+        """
+        if self._json is EMPTY:
+            if self._body is None and self.charset == 'utf-8':
+                # decoded copy of the body is not needed
+                self._json = json.loads(self.content)
+            else:
+                self._json = json.loads(self.body)
+        return self._json
+
+    def form(self) -> dict[str, typing.Any]:
+        """
+        Fields of urlencoded or multipart form, single values are not wrapped in lists like in query
+        """
+        if self._form is None:
+            content_type, params = parse_content_type(self.get_header('content-type') or '')
+            if content_type == 'multipart/form-data':
+                self._parse_multipart(params)
+            else:
+                body = self.body
+                if len(body) > self.MAX_FORM_FIELDS_SIZE:
+                    raise HttpPayloadTooLarge('Form fields are too large')
+                try:
+                    parsed = urllib.parse.parse_qs(body, keep_blank_values=True, max_num_fields=self.MAX_FORM_FIELDS)
+                except ValueError:
+                    raise HttpPayloadTooLarge('Too many fields in form')
+                self._form = {key: value[0] if len(value) == 1 else value for key, value in parsed.items()}
+                self._files = {}
+        assert self._form is not None
+        return self._form
+
+    def files(self) -> dict[str, typing.Any]:
+        """
+        Files of multipart form, the files are closed by DI.form/DI.files at the end of the request
+        """
+        if self._files is None:
+            self.form()
+        assert self._files is not None
+        return self._files
+
+    def _parse_multipart(self, params: dict[str, str]):
+        if 'boundary' not in params:
+            raise PayloadError('Multipart boundary is missing')
+        parser = MultipartParser(
+            params['boundary'],
+            charset=params.get('charset', 'utf-8'),
+            max_memory_size=self.MAX_MEMORY_FILE_SIZE,
+            max_field_size=self.MAX_FORM_FIELD_SIZE,
+            max_total_memory_size=self.MAX_FORM_MEMORY_SIZE,
+            max_fields_size=self.MAX_FORM_FIELDS_SIZE,
+            max_fields=self.MAX_FORM_FIELDS,
+            max_files=self.MAX_FORM_FILES,
+        )
+        try:
+            for chunk in self.stream():
+                parser.feed(chunk)
+            parser.close()
+        except BaseException:
+            parser.cleanup()
+            raise
+        self._form = parser.fields
+        self._files = parser.files
 
 
 class Response:
+    __slots__ = ('status_code', '_headers', '_cookies', 'charset', 'raw', '_body', '_content', 'is_binary', 'stream')
+
     def __init__(self, status_code: int = 200):
         self.status_code: int = status_code
-        self._headers: dict[str, list[str]] = defaultdict(list)
-        self._cookies: SimpleCookie = SimpleCookie()
-        self.body: str = ''
-        self.raw: str | None = None
+        # single header value is kept as is, containers are created on first use
+        self._headers: dict[str, str | list[str]] | None = None
+        # serialized Set-Cookie values by cookie name
+        self._cookies: dict[str, str] | None = None
+        self.charset: str = 'utf-8'
+        self.raw: typing.Any = None
+        # body is kept as set and converted on access, so it is encoded once
+        self._body: str | None = ''
+        self._content: bytes | memoryview | None = None
+        self.is_binary = False
+        # chunks of the streaming response, the body is empty until they are read
+        self.stream: typing.Iterator[bytes | memoryview] | None = None
+
+    @property
+    def body(self) -> str:
+        if self._body is None or self.stream is not None:
+            errors = 'replace' if self.is_binary else 'strict'
+            self._body = bytes(self.content).decode(self.charset, errors)
+        return self._body
+
+    @body.setter
+    def body(self, value: str):
+        self._body = value
+        self._content = None
+        self.is_binary = False
+        self.stream = None
+
+    @property
+    def content(self) -> bytes | memoryview:
+        if self.stream is not None:
+            self.content = b''.join(self.stream)
+        if self._content is None:
+            self._content = typing.cast(str, self._body).encode(self.charset)
+        return self._content
+
+    @content.setter
+    def content(self, value: bytes | memoryview):
+        self._content = value
+        self._body = None
+        self.stream = None
+
+    def iter_content(self) -> typing.Iterator[bytes | memoryview]:
+        if self.stream is not None:
+            return self.stream
+        return iter((self.content,))
+
+    def _encode_chunks(self, chunks: typing.Iterator[str | bytes | memoryview]) -> typing.Iterator[bytes | memoryview]:
+        charset = self.charset
+        try:
+            for chunk in chunks:
+                yield chunk.encode(charset) if isinstance(chunk, str) else chunk
+        finally:
+            # closes the handler iterator, so dependencies of the streaming response are torn down
+            _close_iterator(chunks)
 
     def set_header(self, key: str, value: str | list[str]):
-        if not isinstance(value, list):
-            value = [value]
+        if self._headers is None:
+            self._headers = {}
         self._headers[key.lower()] = value
 
     def add_header(self, key: str, value: str):
         if not isinstance(value, str):
             raise ValueError('Header value should be single string')
-        self._headers[key.lower()].append(value)
+        if self._headers is None:
+            self._headers = {}
+        key = key.lower()
+        values = self._headers.get(key)
+        if values is None:
+            self._headers[key] = value
+        elif isinstance(values, str):
+            self._headers[key] = [values, value]
+        else:
+            values.append(value)
 
     def get_header(self, key: str) -> list[str]:
-        return self._headers.get(key.lower(), [])
+        values = self._headers.get(key.lower()) if self._headers is not None else None
+        if values is None:
+            return []
+        return [values] if isinstance(values, str) else values
 
     def get_single_header(self, key: str, default: str | None = None) -> str | None:
-        values = self._headers.get(key.lower())
+        values = self._headers.get(key.lower()) if self._headers is not None else None
         if not values:
             return default
-        return values[0]
+        return values if isinstance(values, str) else values[0]
 
     def set_cookie(self, name: str, value: str,
                    path: str | None = None,
                    max_age: int | None = None,
-                   http_only: bool | None = None):
-        self._cookies[name] = value
-        if path is not None:
-            self._cookies[name]['path'] = path
-        if max_age is not None:
-            self._cookies[name]['max-age'] = max_age
-        if http_only is not None:
-            self._cookies[name]['httponly'] = http_only
+                   http_only: bool | None = None,
+                   same_site: str | None = None,
+                   secure: bool | None = None):
+        if self._cookies is None:
+            self._cookies = {}
+        self._cookies[name] = format_cookie(
+            name, value, path=path, max_age=max_age, http_only=http_only, same_site=same_site, secure=secure
+        )
 
     def apply_cookies(self):
-        for item in self._cookies.values():
-            self.add_header('Set-Cookie', item.OutputString())
+        if self._cookies is None:
+            return
+        for cookie in self._cookies.values():
+            self.add_header('Set-Cookie', cookie)
 
     @property
     def headers(self) -> typing.Iterable[tuple[str, list[str]]]:
+        if self._headers is None:
+            return
+        for key, values in self._headers.items():
+            yield key, [values] if isinstance(values, str) else values
+
+    def header_values(self) -> typing.Iterator[tuple[str, str | list[str]]]:
+        """
+        Header name and its value, multi value headers have the list of values
+        """
+        if self._headers is None:
+            return
         yield from self._headers.items()
 
-    def finalize(self):
-        self.apply_raw()
+    def header_items(self) -> typing.Iterator[tuple[str, str]]:
+        """
+        Header name and value pairs, multi value headers are repeated
+        """
+        if self._headers is None:
+            return
+        for key, values in self._headers.items():
+            if isinstance(values, str):
+                yield key, values
+            else:
+                for value in values:
+                    yield key, value
+
+    def finalize(self, json_dumps: JsonDumps | None = None):
+        """
+        Moves returned value to the body and cookies to the headers, finalizing again does nothing
+        """
+        self.apply_raw(json_dumps)
         self.apply_cookies()
+        self.raw = None
+        self._cookies = None
 
-    def apply_raw(self):
+    def _text_content_type(self, content_type: str) -> str:
+        # utf-8 is implied for text responses
+        if self.charset == 'utf-8':
+            return content_type
+        return f'{content_type}; charset={self.charset}'
+
+    def apply_raw(self, json_dumps: JsonDumps | None = None):
         if self.raw is None:
             # custom response
             return
 
         if isinstance(self.raw, _HtmlBody):
             self.body = str(self.raw)
-            self.set_header('content-type', 'text/html')
+            self.set_header('content-type', self._text_content_type('text/html'))
         elif isinstance(self.raw, str):
             self.body = self.raw
-            self.set_header('content-type', 'text/plain')
+            self.set_header('content-type', self._text_content_type('text/plain'))
         elif isinstance(self.raw, dict) or isinstance(self.raw, list):
-            self.body = json.dumps(self.raw)
+            self.content = (json_dumps or default_json_dumps)(self.raw)
+            self.set_header('content-type', 'application/json')
+        elif isinstance(self.raw, (bytes, memoryview)):
+            self.content = self.raw
+            self.is_binary = True
+            if self.get_single_header('content-type') is None:
+                self.set_header('content-type', 'application/octet-stream')
+        elif isinstance(self.raw, _JsonStream):
+            self.stream = self.raw.chunks(json_dumps or default_json_dumps)
             self.set_header('content-type', 'application/json')
+        elif isinstance(self.raw, collections.abc.Iterator):
+            self.stream = self._encode_chunks(self.raw)
+            if self.get_single_header('content-type') is None:
+                self.set_header('content-type', 'application/octet-stream')
         else:
             raise ValueError(f"Unsupported return type {type(self.raw)}")
 
 
-@dataclass
+class Compression:
+    """
+    Compresses response bodies with gzip or deflate negotiated on Accept-Encoding,
+    compressed bodies of byte-identical responses are kept in LRU cache
+    """
+    # zlib wbits of the encodings in the order of preference
+    ENCODINGS = {
+        'gzip': 16 + zlib.MAX_WBITS,
+        'deflate': zlib.MAX_WBITS,
+    }
+    COMPRESSIBLE_TYPES = {
+        'application/json', 'application/javascript', 'application/xml', 'image/svg+xml',
+    }
+    CACHE_MAX_BODY_SIZE = 1024 * 1024
+
+    def __init__(self, min_size: int = 1024, level: int = 6, cache_size: int = 32):
+        self.min_size = min_size
+        self.level = level
+        self.cache_size = cache_size
+        self._cache: OrderedDict[tuple[str, bytes], bytes] = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    @classmethod
+    def is_compressible(cls, content_type: str | None) -> bool:
+        if not content_type:
+            return False
+        content_type = content_type.split(';', 1)[0].strip().lower()
+        return (
+            content_type.startswith('text/')
+            or content_type in cls.COMPRESSIBLE_TYPES
+            or content_type.endswith(('+json', '+xml'))
+        )
+
+    @classmethod
+    def negotiate(cls, accept_encoding: str | None) -> str | None:
+        if not accept_encoding:
+            return None
+
+        accepted: dict[str, float] = {}
+        for item in accept_encoding.split(','):
+            name, _, params = item.partition(';')
+            quality = 1.0
+            params = params.strip()
+            if params.startswith('q='):
+                try:
+                    quality = float(params[2:])
+                except ValueError:
+                    quality = 0.0
+            accepted[name.strip().lower()] = quality
+
+        best, best_quality = None, 0.0
+        for encoding in cls.ENCODINGS:
+            quality = accepted.get(encoding, accepted.get('*', 0.0))
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    def apply(self, request: Request, response: Response):
+        if response.stream is not None or response.status_code in (204, 304):
+            return
+        if response.get_single_header('content-encoding') is not None:
+            return
+        if not self.is_compressible(response.get_single_header('content-type')):
+            return
+
+        content = response.content
+        if len(content) < self.min_size:
+            return
+
+        if 'accept-encoding' not in (value.lower() for value in response.get_header('vary')):
+            response.add_header('vary', 'Accept-Encoding')
+
+        encoding = self.negotiate(request.get_header('accept-encoding'))
+        if encoding is None:
+            return
+
+        response.content = self._compress(encoding, bytes(content))
+        response.is_binary = True
+        response.set_header('content-encoding', encoding)
+        etag = response.get_single_header('etag')
+        if etag is not None and etag.endswith('"'):
+            # compressed representation needs its own strong tag
+            response.set_header('etag', f'{etag[:-1]}-{encoding}"')
+
+    def _compress(self, encoding: str, content: bytes) -> bytes:
+        cacheable = self.cache_size > 0 and len(content) <= self.CACHE_MAX_BODY_SIZE
+        key = (encoding, content)
+        if cacheable:
+            with self._cache_lock:
+                compressed = self._cache.get(key)
+                if compressed is not None:
+                    self._cache.move_to_end(key)
+                    return compressed
+
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, self.ENCODINGS[encoding])
+        compressed = compressor.compress(content) + compressor.flush()
+
+        if cacheable:
+            with self._cache_lock:
+                self._cache[key] = compressed
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return compressed
+
+
+def _quote_etag(etag: str) -> str:
+    if etag.startswith(('"', 'W/"')):
+        return etag
+    return f'"{etag}"'
+
+
+def _opaque_etag(etag: str) -> str:
+    # weak comparison as required for If-None-Match
+    etag = etag.strip().removeprefix('W/')
+    for encoding in Compression.ENCODINGS:
+        # tags of compressed responses have encoding suffix
+        suffix = f'-{encoding}"'
+        if etag.endswith(suffix):
+            return etag[:-len(suffix)] + '"'
+    return etag
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == '*':
+        return True
+    etag = _opaque_etag(etag)
+    return any(_opaque_etag(candidate) == etag for candidate in if_none_match.split(','))
+
+
+def _is_not_modified(request: Request, etag: str | None, last_modified: datetime.datetime | None) -> bool:
+    if request.method.upper() not in ('GET', 'HEAD'):
+        return False
+
+    if_none_match = request.get_header('if-none-match')
+    if if_none_match is not None:
+        return etag is not None and _etag_matches(if_none_match, etag)
+
+    if_modified_since = request.get_header('if-modified-since')
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = email.utils.parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=datetime.timezone.utc)
+    return last_modified.replace(microsecond=0) <= since
+
+
+class ResponseCacheInfo(typing.NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+    nbytes: int
+
+
+class ResponseCache:
+    """
+    In-process cache of finalized route responses keyed on method, path, query
+    and the request headers listed in vary, entries expire after ttl seconds.
+    Only complete 200 responses without cookies are stored
+    """
+    def __init__(self, ttl: float, max_entries: int = 128, max_bytes: int = 16 * 1024 * 1024,
+                 vary: typing.Iterable[str] = ()):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.vary = tuple(name.lower() for name in vary)
+        # expiration time, response and its size in the order of use
+        self._entries: OrderedDict[tuple, tuple[float, Response, int]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._nbytes = 0
+        self._hits = 0
+        self._misses = 0
+
+    def key(self, request: Request) -> tuple:
+        # single values are denormalized by adapters, lists have to be hashable
+        query = tuple(sorted(
+            (name, values if isinstance(values, str) else tuple(values)) for name, values in request.query.items()
+        ))
+        headers = tuple(request.get_header(name) for name in self.vary)
+        return request.method.upper(), request.path, query, headers
+
+    @staticmethod
+    def is_cacheable(response: Response) -> bool:
+        if response.status_code != 200 or response.stream is not None:
+            return False
+        if response.get_single_header('set-cookie') is not None:
+            return False
+        cache_control = ','.join(response.get_header('cache-control')).lower()
+        return 'no-store' not in cache_control and 'private' not in cache_control
+
+    def get(self, request: Request) -> Response | None:
+        key = self.key(request)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+        return self._copy(entry[1])
+
+    def put(self, request: Request, response: Response):
+        if not self.is_cacheable(response):
+            return
+        stored = self._copy(response)
+        size = len(stored.content)
+        if size > self.max_bytes:
+            return
+
+        key = self.key(request)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, stored, size)
+            self._nbytes += size
+            while len(self._entries) > self.max_entries or self._nbytes > self.max_bytes:
+                self._nbytes -= self._entries.popitem(last=False)[1][2]
+
+    def _remove(self, key: tuple):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._nbytes -= entry[2]
+
+    @staticmethod
+    def _copy(response: Response) -> Response:
+        # responses are changed while they are processed, so the stored one is never returned
+        copy = Response(status_code=response.status_code)
+        copy.charset = response.charset
+        for key, values in response.headers:
+            copy.set_header(key, list(values))
+        copy.content = bytes(response.content)
+        copy._body = response._body
+        copy.is_binary = response.is_binary
+        return copy
+
+    def cache_info(self) -> ResponseCacheInfo:
+        return ResponseCacheInfo(
+            hits=self._hits,
+            misses=self._misses,
+            maxsize=self.max_entries,
+            currsize=len(self._entries),
+            nbytes=self._nbytes,
+        )
+
+    def cache_clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+            self._hits = 0
+            self._misses = 0
+
+
+@dataclass(slots=True)
 class InjectContext:
     param_name: str | None  # name of the function parameter
     param_type: type | None  # type of the function parameter if specified
@@ -190,11 +1175,31 @@ class InjectContext:
 
 
 class _Dependency:
-    def __init__(self, generator: typing.Callable):
-        if not inspect.isgeneratorfunction(generator):
+    def __init__(self, generator: typing.Callable,
+                 binder: typing.Callable[[str | None, type | None], typing.Callable] | None = None,
+                 app_scoped: bool = False):
+        if not inspect.isgeneratorfunction(generator) and not inspect.isasyncgenfunction(generator):
             raise ValueError(f"Only generator functions can be injected. "
                              f"Function {generator.__name__} can not")
         self.generator = generator
+        self.app_scoped = app_scoped
+        # creates generator specialized for the parameter it is injected into
+        self._binder = binder
+        # the same generator is returned for the parameter, so the plan resolves it once
+        self._bound: dict[tuple, typing.Callable] = {}
+
+    def bind(self, param_name: str | None, param_type: type | None) -> typing.Callable:
+        if self._binder is None:
+            return self.generator
+        key = (param_name, param_type)
+        try:
+            return self._bound[key]
+        except KeyError:
+            generator = self._bound[key] = self._binder(param_name, param_type)
+            return generator
+        except TypeError:
+            # unhashable type annotation
+            return self._binder(param_name, param_type)
 
 
 class DI:
@@ -205,6 +1210,30 @@ class DI:
         def __call__(self, status_code: int):
             self._response.status_code = status_code
 
+    class Conditional:
+        def __init__(self, request: Request, response: Response):
+            self._request = request
+            self._response = response
+
+        def __call__(self, etag: str | None = None, last_modified: datetime.datetime | None = None):
+            """
+            Sets validators of the response and stops processing
+            with 304 response when the client copy is current
+            """
+            headers = {}
+            if etag is not None:
+                headers['etag'] = _quote_etag(etag)
+            if last_modified is not None:
+                if last_modified.tzinfo is None:
+                    last_modified = last_modified.replace(tzinfo=datetime.timezone.utc)
+                last_modified = last_modified.astimezone(datetime.timezone.utc)
+                headers['last-modified'] = email.utils.format_datetime(last_modified, usegmt=True)
+
+            for key, value in headers.items():
+                self._response.set_header(key, value)
+            if _is_not_modified(self._request, headers.get('etag'), last_modified):
+                raise HttpNotModified(headers)
+
     class Cookies:
         def __init__(self, request: Request, response: Response):
             self._request = request
@@ -216,15 +1245,25 @@ class DI:
         def set(self, name: str, value: str,
                 path: str = '/',
                 max_age: int | None = None,
-                http_only: bool | None = None):
+                http_only: bool | None = None,
+                same_site: str | None = None,
+                secure: bool | None = None):
             self._response.set_cookie(
-                name, value, path=path, max_age=max_age, http_only=http_only
+                name, value, path=path, max_age=max_age, http_only=http_only, same_site=same_site, secure=secure
             )
 
     @staticmethod
     def inject(dependency: typing.Callable):
         return _Dependency(dependency)
 
+    @staticmethod
+    def singleton(dependency: typing.Callable):
+        """
+        Dependency shared by all requests to the app, created on the first use or on Chasha.warmup
+        and torn down on Chasha.shutdown. It can only depend on other singletons
+        """
+        return _Dependency(dependency, app_scoped=True)
+
     @classmethod
     def status_code(cls, default_status_code: int | None = None):
         def dependency(r: Response = cls.response()):
@@ -235,9 +1274,11 @@ class DI:
 
     @classmethod
     def cookies(cls):
-        def dependency(request: Request = cls.request(), response: Response = cls.response()):
-            yield cls.Cookies(request=request, response=response)
-        return cls.inject(dependency)
+        return cls.inject(_cookies)
+
+    @classmethod
+    def conditional(cls):
+        return cls.inject(_conditional)
 
     @classmethod
     def request(cls):
@@ -257,37 +1298,439 @@ class DI:
 
     @classmethod
     def query(cls, name: str | None = None, default: typing.Any = EMPTY):
+        def bind(param_name: str | None, param_type: type | None):
+            query_name: str = name or param_name or ''
+            assert query_name
+            coerce = TypeCast.compile(param_type)
+            optional = param_type is not None and TypeCast.is_optional(param_type)
+
+            def _from_query(request: Request = cls.request()):
+                try:
+                    value = request.query[query_name]
+                except KeyError:
+                    if default is not EMPTY:
+                        yield default
+                        return
+                    if optional:
+                        yield None
+                        return
+                    raise QueryParamMissing(f"Query parameter '{query_name}' is mandatory", fields=[query_name])
+                try:
+                    yield coerce(value)
+                except ValueError:
+                    raise HttpBadRequest(f"Failed to convert parameter {query_name}")
+            return _from_query
+
         def _from_query(context: InjectContext):
-            param_name = name or context.param_name
-            assert param_name
-            try:
-                value = context.request.query[param_name]
-            except KeyError:
-                if default is not EMPTY:
-                    yield default
-                    return
-                if context.param_type and TypeCast.is_optional(context.param_type):
-                    yield None
-                    return
-                raise QueryParamMissing(f"Query parameter '{param_name}' is mandatory", fields=[param_name])
-            try:
-                yield TypeCast.coerce_param(context.param_type, value)
-            except ValueError:
-                raise HttpBadRequest(f"Failed to convert parameter {param_name}")
-        return cls.inject(_from_query)
+            yield from bind(context.param_name, context.param_type)(context.request)
+        return _Dependency(_from_query, binder=bind)
+
+    @classmethod
+    def form(cls, name: str | None = None, default: typing.Any = EMPTY):
+        """
+        Field of urlencoded or multipart form converted to the parameter type
+        """
+        def bind(param_name: str | None, param_type: type | None):
+            field_name: str = name or param_name or ''
+            assert field_name
+            coerce = TypeCast.compile(param_type)
+            optional = param_type is not None and TypeCast.is_optional(param_type)
+
+            def _from_form(form: tuple = cls.inject(_form_data)):
+                fields, _ = form
+                try:
+                    value = fields[field_name]
+                except KeyError:
+                    if default is not EMPTY:
+                        yield default
+                        return
+                    if optional:
+                        yield None
+                        return
+                    raise QueryParamMissing(f"Form field '{field_name}' is mandatory", fields=[field_name])
+                try:
+                    yield coerce(value)
+                except ValueError:
+                    raise HttpBadRequest(f"Failed to convert form field {field_name}")
+            return _from_form
+
+        def _from_form(context: InjectContext, form: tuple = cls.inject(_form_data)):
+            yield from bind(context.param_name, context.param_type)(form)
+        return _Dependency(_from_form, binder=bind)
+
+    @classmethod
+    def files(cls, name: str | None = None):
+        """
+        Uploaded file of multipart form, list of files when the parameter is annotated as list
+        """
+        def bind(param_name: str | None, param_type: type | None):
+            field_name: str = name or param_name or ''
+            assert field_name
+            many = param_type is not None and TypeCast.get_real_type(param_type) is list
+            optional = param_type is not None and TypeCast.is_optional(param_type)
+
+            def _from_files(form: tuple = cls.inject(_form_data)):
+                _, files = form
+                value = files.get(field_name)
+                if value is None and not optional:
+                    if many:
+                        yield []
+                        return
+                    raise QueryParamMissing(f"File '{field_name}' is mandatory", fields=[field_name])
+                if many and not isinstance(value, list):
+                    value = [value]
+                elif not many and isinstance(value, list):
+                    value = value[0]
+                yield value
+            return _from_files
+
+        def _from_files(context: InjectContext, form: tuple = cls.inject(_form_data)):
+            yield from bind(context.param_name, context.param_type)(form)
+        return _Dependency(_from_files, binder=bind)
 
     @classmethod
     def body(cls, loader=lambda data, type_: data):
         def dependency(context: InjectContext, request: Request = DI.request()):
             try:
                 yield loader(request.body, context.param_type)
+            except HttpError:
+                raise
             except Exception:
                 raise PayloadError()
         return cls.inject(dependency)
 
     @classmethod
     def json_body(cls):
-        return cls.body(loader=lambda data, _: json.loads(data))
+        return cls.inject(_json_body)
+
+
+def _form_data(request: Request = DI.request()):
+    # shared by DI.form and DI.files, so the form is parsed once and files are closed after the request
+    try:
+        fields, files = request.form(), request.files()
+    except HttpError:
+        raise
+    except Exception:
+        raise PayloadError()
+    try:
+        yield fields, files
+    finally:
+        _close_files(files)
+
+
+def _json_body(request: Request = DI.request()):
+    # request keeps the parsed value, dependency is shared to resolve it once per request
+    try:
+        value = request.json()
+    except HttpError:
+        raise
+    except Exception:
+        raise PayloadError()
+    yield value
+
+
+def _cookies(request: Request = DI.request(), response: Response = DI.response()):
+    # shared by all DI.cookies() so the dependency is resolved once per request
+    yield DI.Cookies(request=request, response=response)
+
+
+def _conditional(request: Request = DI.request(), response: Response = DI.response()):
+    yield DI.Conditional(request=request, response=response)
+
+
+class _InjectionStep:
+    def __init__(self, generator: typing.Callable,
+                 args: list[tuple[str, int]],
+                 context_params: list[str],
+                 param_name: str | None,
+                 param_type: type | None,
+                 app_scoped: bool = False):
+        self.generator = generator
+        self.args = args  # function parameter and the slot of the resolved value
+        self.context_params = context_params
+        self.param_name = param_name
+        self.param_type = param_type
+        self.app_scoped = app_scoped
+        self.is_async = inspect.isasyncgenfunction(generator) or inspect.iscoroutinefunction(generator)
+        # steps of the same level do not depend on each other
+        self.level = 0
+
+    def kwargs(self, values: list, request: Request, response: Response) -> dict[str, typing.Any]:
+        kwargs = {attr: values[slot] for attr, slot in self.args}
+        if self.context_params:
+            context = InjectContext(
+                param_name=self.param_name,
+                param_type=self.param_type,
+                request=request,
+                response=response,
+            )
+            for attr in self.context_params:
+                kwargs[attr] = context
+        return kwargs
+
+
+class _InjectionPlan:
+    """
+    Dependency graph of the function flattened into the list of steps,
+    each step resolves a single dependency from the values resolved before
+    """
+    REQUEST_SLOT = 0
+    RESPONSE_SLOT = 1
+
+    def __init__(self, func: typing.Callable, app: 'Chasha'):
+        self.app = app
+        self.steps: list[_InjectionStep] = []
+        # each dependency is resolved once per request, dependencies using InjectContext
+        # are distinguished by the parameter they are injected into
+        self._slots: dict[tuple, int] = {}
+        # whether the function uses anything besides app scoped dependencies
+        self.request_scoped = False
+        self.call = self._compile_call(None, None, func)
+        self.is_async = self.call.is_async or any(step.is_async for step in self.steps)
+
+        self.levels: list[list[tuple[int, _InjectionStep]]] = []
+        for slot, step in enumerate(self.steps, start=2):
+            if step.level == len(self.levels):
+                self.levels.append([])
+            self.levels[step.level].append((slot, step))
+
+    def _compile_call(self, param_name: str | None, param_type: type | None,
+                      func: typing.Callable) -> _InjectionStep:
+        spec = inspect.signature(func)
+        args = []
+        context_params = []
+        for attr, attr_spec in spec.parameters.items():
+            if isinstance(attr_spec.default, _Dependency):
+                dependency_type = attr_spec.annotation if attr_spec.annotation != attr_spec.empty else None
+                args.append((attr, self._compile_dependency(attr, dependency_type, attr_spec.default)))
+            elif attr_spec.annotation is InjectContext:
+                context_params.append(attr)
+                self.request_scoped = True
+        return _InjectionStep(func, args, context_params, param_name, param_type)
+
+    def _compile_dependency(self, param_name: str, param_type: type | None, dependency: _Dependency) -> int:
+        generator = dependency.bind(param_name, param_type)
+        if dependency.app_scoped:
+            if self.app._get_plan(generator).request_scoped:
+                raise ValueError(f"Singleton {generator.__name__} can only depend on other singletons")
+            step = _InjectionStep(generator, [], [], param_name, param_type, app_scoped=True)
+            # async singleton makes the plan async only until it is created, but it is simpler to keep it async
+            step.is_async = step.is_async or self.app._get_plan(generator).is_async
+            return self._add_step((generator, True), step)
+
+        self.request_scoped = True
+        if generator is DI._request:
+            return self.REQUEST_SLOT
+        if generator is DI._response:
+            return self.RESPONSE_SLOT
+
+        # dependency shared by other dependencies is compiled once
+        for key in ((generator, False), (generator, False, param_name, param_type)):
+            slot = self._slot(key)
+            if slot is not None:
+                return slot
+
+        step = self._compile_call(param_name, param_type, generator)
+        key = (generator, False)
+        if step.context_params:
+            key += (param_name, param_type)
+        return self._add_step(key, step)
+
+    def _slot(self, key: tuple) -> int | None:
+        try:
+            return self._slots.get(key)
+        except TypeError:
+            return None
+
+    def _add_step(self, key: tuple, step: _InjectionStep) -> int:
+        if key not in self._slots:
+            step.level = max((self.steps[slot - 2].level + 1 for _, slot in step.args if slot > 1), default=0)
+            self.steps.append(step)
+            # slots of the request and the response go first
+            self._slots[key] = len(self.steps) + 1
+        return self._slots[key]
+
+    def __call__(self, request: Request, response: Response, *args, **kwargs):
+        if self.is_async:
+            return _run_sync(self.call_async(request, response, *args, **kwargs))
+
+        values = [request, response]
+        generators = []
+        try:
+            for step in self.steps:
+                if step.app_scoped:
+                    values.append(self.app._get_app_value(step.generator))
+                    continue
+                gen = step.generator(**step.kwargs(values, request, response))
+                values.append(next(gen))
+                generators.append(gen)
+
+            kwargs.update(self.call.kwargs(values, request, response))
+            result = self.call.generator(*args, **kwargs)
+        except BaseException:
+            for gen in reversed(generators):
+                gen.close()
+            raise
+
+        if generators and _is_stream(result):
+            # dependencies are used while the response is streamed
+            return _defer_teardown(result, functools.partial(_teardown_all, generators))
+
+        _teardown_all(generators, failed=False)
+        return result
+
+    async def call_async(self, request: Request, response: Response, *args, **kwargs):
+        values: list = [request, response] + [None] * len(self.steps)
+        generators: list = []
+        try:
+            for level in self.levels:
+                await self._resolve_level(level, values, generators, request, response)
+
+            kwargs.update(self.call.kwargs(values, request, response))
+            result = self.call.generator(*args, **kwargs)
+            if self.call.is_async:
+                result = await result
+        except BaseException:
+            for gen in reversed(generators):
+                if inspect.isasyncgen(gen):
+                    await gen.aclose()
+                else:
+                    gen.close()
+            raise
+
+        if generators and _is_stream(result):
+            return _defer_teardown(result, functools.partial(_teardown_all_deferred, generators))
+
+        for gen in reversed(generators):
+            await _teardown_async(gen)
+
+        return result
+
+    async def _resolve_level(self, level: list[tuple[int, _InjectionStep]], values: list, generators: list,
+                             request: Request, response: Response):
+        pending = []
+        for slot, step in level:
+            if step.app_scoped:
+                values[slot] = await self.app._get_app_value_async(step.generator)
+            elif step.is_async:
+                pending.append((slot, step.generator(**step.kwargs(values, request, response))))
+            else:
+                gen = step.generator(**step.kwargs(values, request, response))
+                values[slot] = next(gen)
+                generators.append(gen)
+
+        if not pending:
+            return
+        if len(pending) == 1:
+            slot, gen = pending[0]
+            values[slot] = await gen.__anext__()
+            generators.append(gen)
+            return
+
+        # steps of the level are independent, so async ones are resolved concurrently
+        results = await asyncio.gather(*(gen.__anext__() for _, gen in pending), return_exceptions=True)
+        errors = []
+        for (slot, gen), result in zip(pending, results, strict=True):
+            if isinstance(result, BaseException):
+                errors.append(result)
+                continue
+            values[slot] = result
+            generators.append(gen)
+        if errors:
+            raise errors[0]
+
+    def call_app_scoped(self) -> typing.Generator:
+        values = [None, None]
+        for step in self.steps:
+            values.append(self.app._get_app_value(step.generator))
+        return self.call.generator(**{attr: values[slot] for attr, slot in self.call.args})
+
+    async def call_app_scoped_async(self) -> typing.Generator | typing.AsyncGenerator:
+        values = [None, None]
+        for step in self.steps:
+            values.append(await self.app._get_app_value_async(step.generator))
+        return self.call.generator(**{attr: values[slot] for attr, slot in self.call.args})
+
+
+def _teardown(gen: typing.Generator):
+    try:
+        next(gen)
+    except StopIteration:
+        pass
+    gen.close()
+
+
+def _teardown_all(generators: list[typing.Generator], failed: bool):
+    for gen in reversed(generators):
+        if failed:
+            gen.close()
+        else:
+            _teardown(gen)
+
+
+async def _teardown_all_async(generators: list, failed: bool):
+    for gen in reversed(generators):
+        if not failed:
+            await _teardown_async(gen)
+        elif inspect.isasyncgen(gen):
+            await gen.aclose()
+        else:
+            gen.close()
+
+
+# teardowns scheduled on the running loop, referenced until they are done
+_teardown_tasks: set[asyncio.Task] = set()
+
+
+def _teardown_all_deferred(generators: list, failed: bool):
+    """
+    Tears down dependencies of the async handler after its response is streamed
+    """
+    coroutine = _teardown_all_async(generators, failed)
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        _run_sync(coroutine)
+        return
+    task = loop.create_task(coroutine)
+    _teardown_tasks.add(task)
+    task.add_done_callback(_teardown_tasks.discard)
+
+
+def _is_stream(result: typing.Any) -> bool:
+    # the same values Response.apply_raw streams
+    return isinstance(result, (_JsonStream, collections.abc.Iterator))
+
+
+def _defer_teardown(result: typing.Any, teardown: typing.Callable[[bool], None]) -> typing.Any:
+    if isinstance(result, _JsonStream):
+        return _JsonStream(_ClosingIterator(iter(result.items), teardown))
+    return _ClosingIterator(result, teardown)
+
+
+async def _teardown_async(gen: typing.Generator | typing.AsyncGenerator):
+    if not inspect.isasyncgen(gen):
+        _teardown(typing.cast(typing.Generator, gen))
+        return
+    try:
+        await gen.__anext__()
+    except StopAsyncIteration:
+        pass
+    await gen.aclose()
+
+
+_loops = threading.local()
+
+
+def _run_sync(coroutine: typing.Coroutine):
+    """
+    Runs the coroutine on the event loop of the current thread,
+    the loop is kept alive between the calls so warm invocations reuse it
+    """
+    loop = getattr(_loops, 'loop', None)
+    if loop is None or loop.is_closed():
+        loop = _loops.loop = asyncio.new_event_loop()
+    return loop.run_until_complete(coroutine)
 
 
 class Chashka:
@@ -296,17 +1739,20 @@ class Chashka:
     def __init__(self, path_prefix: str = ''):
         self._router = Router(prefix=path_prefix)
 
-    def _route(self, methods: typing.Iterable[str], path: str):
+    def _route(self, methods: typing.Iterable[str], path: str, cache: ResponseCache | None = None):
         def decorator(func):
-            self._router.add_route(methods, path, func)
+            self._router.add_route(methods, path, func, cache=cache)
         return decorator
 
     def route(self, path: str, http_methods: typing.Iterable[str] = ()):
         http_methods = http_methods or [Router.HTTP_ANY]
         return self._route(http_methods, path)
 
-    def get(self, path: str):
-        return self._route(['GET'], path)
+    def get(self, path: str, cache: ResponseCache | None = None):
+        """
+        :param cache: responses of the route are served from the cache until they expire
+        """
+        return self._route(['GET'], path, cache=cache)
 
     def post(self, path: str):
         return self._route(['POST'], path)
@@ -324,12 +1770,34 @@ class Chashka:
     def html(cls, response: str) -> _HtmlBody:
         return _HtmlBody(response)
 
+    @classmethod
+    def json_stream(cls, items: typing.Iterable) -> _JsonStream:
+        """
+        JSON array response serialized item by item while it is sent
+        """
+        return _JsonStream(items)
+
 
 class Chasha(Chashka):
-    def __init__(self, path_prefix: str = ''):
+    def __init__(self, path_prefix: str = '', route_cache_size: int = 0,
+                 json_dumps: JsonDumps | None = None,
+                 compression: Compression | None = None,
+                 etag: bool = False):
         super().__init__(path_prefix=path_prefix)
+        self._router.cache_size = route_cache_size
+        self.json_dumps: JsonDumps = json_dumps or default_json_dumps
+        self.compression = compression
+        self.etag = etag
+        self._plans: dict[typing.Callable, _InjectionPlan] = {}
+        # values of singleton dependencies and their generators in the order of creation
+        self._app_values: dict[typing.Callable, typing.Any] = {}
+        self._app_generators: list[typing.Generator | typing.AsyncGenerator] = []
+        self._app_lock = threading.RLock()
         self._error_handlers: dict[type, typing.Callable] = {}
+        # handlers applicable to the exception class in the order of its MRO
+        self._error_handlers_cache: dict[type, list[typing.Callable]] = {}
         self._add_error_handler(HttpRedirect, self._redirect_handler)
+        self._add_error_handler(HttpNotModified, self._not_modified_handler)
         self._add_error_handler(HttpError, self._http_error_handler)
         self._add_error_handler(Exception, self._exception_handler)
 
@@ -339,6 +1807,12 @@ class Chasha(Chashka):
         response.set_header('content-type', 'text/plain')
         response.set_header('location', exception.to)
 
+    @staticmethod
+    def _not_modified_handler(exception: HttpNotModified, response: Response = DI.response()):
+        response.status_code = exception.status_code
+        for key, value in exception.headers.items():
+            response.set_header(key, value)
+
     @staticmethod
     def _http_error_handler(exception: HttpError, response: Response = DI.response()):
         response.status_code = exception.status_code
@@ -350,26 +1824,140 @@ class Chasha(Chashka):
     def _exception_handler(_: Exception, response: Response = DI.response()):
         response.status_code = 500
 
+    def _route(self, methods: typing.Iterable[str], path: str, cache: ResponseCache | None = None):
+        add_route = super()._route(methods, path, cache=cache)
+
+        def decorator(func):
+            add_route(func)
+            self._get_plan(func)
+        return decorator
+
     def _add_error_handler(self, exception: type, func: typing.Callable):
+        if inspect.isasyncgenfunction(func):
+            raise ValueError(f'Async generator {func.__name__} can not be an exception handler')
         self._error_handlers[exception] = func
+        self._error_handlers_cache.clear()
+        self._get_plan(func)
+
+    def _get_error_handlers(self, exception_type: type) -> list[typing.Callable]:
+        handlers = self._error_handlers_cache.get(exception_type)
+        if handlers is None:
+            handlers = [
+                self._error_handlers[type_] for type_ in exception_type.__mro__
+                if type_ in self._error_handlers
+            ]
+            self._error_handlers_cache[exception_type] = handlers
+        return handlers
+
+    def _get_plan(self, func: typing.Callable) -> _InjectionPlan:
+        plan = self._plans.get(func)
+        if plan is None:
+            plan = self._plans[func] = _InjectionPlan(func, self)
+        return plan
+
+    def _get_app_value(self, generator: typing.Callable) -> typing.Any:
+        try:
+            return self._app_values[generator]
+        except KeyError:
+            pass
+
+        if self._get_plan(generator).is_async:
+            return _run_sync(self._get_app_value_async(generator))
+
+        with self._app_lock:
+            if generator not in self._app_values:
+                gen = self._get_plan(generator).call_app_scoped()
+                self._app_values[generator] = next(gen)
+                self._app_generators.append(gen)
+            return self._app_values[generator]
+
+    async def _get_app_value_async(self, generator: typing.Callable) -> typing.Any:
+        try:
+            return self._app_values[generator]
+        except KeyError:
+            pass
+
+        plan = self._get_plan(generator)
+        if not plan.is_async:
+            return self._get_app_value(generator)
+
+        gen = await plan.call_app_scoped_async()
+        if inspect.isasyncgen(gen):
+            value = await gen.__anext__()
+        else:
+            value = next(typing.cast(typing.Generator, gen))
+        with self._app_lock:
+            created = generator in self._app_values
+            if not created:
+                self._app_values[generator] = value
+                self._app_generators.append(gen)
+        if created:
+            # the singleton has been created concurrently while awaiting
+            await _teardown_async(gen)
+        return self._app_values[generator]
+
+    def warmup(self):
+        """
+        Compiles all handlers and creates singleton dependencies used by them
+        """
+        handlers = list(self._router.handlers()) + list(self._error_handlers.values())
+        for handler in handlers:
+            for step in self._get_plan(handler).steps:
+                if step.app_scoped:
+                    self._get_app_value(step.generator)
+
+    def shutdown(self):
+        """
+        Tears down singleton dependencies in the reverse order of creation
+        """
+        for gen in reversed(self._pop_app_generators()):
+            try:
+                if inspect.isasyncgen(gen):
+                    _run_sync(_teardown_async(gen))
+                else:
+                    _teardown(gen)
+            except Exception as e:
+                LOG.exception(f'Failed to tear down singleton dependency {e}')
+
+    async def shutdown_async(self):
+        for gen in reversed(self._pop_app_generators()):
+            try:
+                await _teardown_async(gen)
+            except Exception as e:
+                LOG.exception(f'Failed to tear down singleton dependency {e}')
+
+    def _pop_app_generators(self) -> list:
+        with self._app_lock:
+            generators = self._app_generators
+            self._app_generators = []
+            self._app_values.clear()
+        return generators
 
     def _handle_error(self, exception: Exception, request: Request):
         response = Response(status_code=500)
 
-        exception_order = sorted(self._error_handlers,
-                                 key=lambda type_: len(type_.__mro__),
-                                 reverse=True)
+        for handler in self._get_error_handlers(type(exception)):
+            try:
+                response.raw = self.invoke(request, response, handler, exception)
+                response.finalize(self.json_dumps)
+                return response
+            except Exception as e:
+                LOG.error(f'Failed to process error handler: {e}')
+                pass
 
-        for exception_type in exception_order:
-            if isinstance(exception, exception_type):
-                try:
-                    handler = self._error_handlers[exception_type]
-                    response.raw = self.invoke(request, response, handler, exception)
-                    response.finalize()
-                    return response
-                except Exception as e:
-                    LOG.error(f'Failed to process error handler: {e}')
-                    pass
+        return Response(status_code=500)
+
+    async def _handle_error_async(self, exception: Exception, request: Request):
+        response = Response(status_code=500)
+
+        for handler in self._get_error_handlers(type(exception)):
+            try:
+                response.raw = await self.invoke_async(request, response, handler, exception)
+                response.finalize(self.json_dumps)
+                return response
+            except Exception as e:
+                LOG.error(f'Failed to process error handler: {e}')
+                pass
 
         return Response(status_code=500)
 
@@ -388,87 +1976,197 @@ class Chasha(Chashka):
         return self.exception_handler(Exception)
 
     def invoke(self, __request: Request, __response: Response, __func: typing.Callable, *args, **kwargs):
-        context = InjectContext(
-            param_name=None,
-            param_type=None,
-            request=__request,
-            response=__response,
-        )
-        return self.__invoke(context, __func, *args, **kwargs)
-
-    def __invoke(self, __context: InjectContext, __func: typing.Callable, *args, **kwargs):
-        spec = inspect.signature(__func)
-        di = []
-        for attr, attr_spec in spec.parameters.items():
-            if attr_spec.annotation is InjectContext:
-                kwargs[attr] = __context
-
-            if isinstance(attr_spec.default, _Dependency):
-                context = InjectContext(
-                    param_name=attr,
-                    param_type=attr_spec.annotation if attr_spec.annotation != attr_spec.empty else None,
-                    request=__context.request,
-                    response=__context.response
-                )
-                gen = self.__invoke(context, attr_spec.default.generator)
-                kwargs[attr] = next(gen)
-                di.append(gen)
-                continue
-
-        result = __func(*args, **kwargs)
+        return self._get_plan(__func)(__request, __response, *args, **kwargs)
 
-        for gen in di:
-            try:
-                next(gen)
-            except StopIteration:
-                pass
-            gen.close()
+    async def invoke_async(self, __request: Request, __response: Response, __func: typing.Callable, *args, **kwargs):
+        return await self._get_plan(__func).call_async(__request, __response, *args, **kwargs)
 
-        return result
+    def route_cache_info(self) -> 'RouteCacheInfo':
+        return self._router.cache_info()
 
     def handle_request(self, request: Request) -> Response:
+        """
+        Routes and invokes the handler, responses of cached routes are returned complete
+        """
+        spec, kwargs = self._router.resolve(request.method, request.path)
+        if spec.cache is not None:
+            cached = spec.cache.get(request)
+            if cached is not None:
+                return cached
         response = Response(status_code=200)
-        handler, kwargs = self._router.handle_route(request.method, request.path)
-        response.raw = self.invoke(request, response, handler, **kwargs)
+        response.raw = self.invoke(request, response, spec.handler, **kwargs)
+        if spec.cache is not None:
+            response.finalize(self.json_dumps)
+            spec.cache.put(request, response)
         return response
 
+    def serve_error(self, request: Request, exception: Exception) -> Response:
+        """
+        Serves the error raised before the request is routed, e.g. by the adapter
+        """
+        return self._process_response(request, self._handle_error(exception, request))
+
     def serve(self, request: Request) -> Response:
         try:
             response = self.handle_request(request)
-            response.finalize()
+            response.finalize(self.json_dumps)
         except Exception as e:
             if not isinstance(e, HttpError):
                 LOG.exception(f'Failed to process handler {e}')
             response = self._handle_error(e, request)
+        return self._process_response(request, response)
+
+    # headers the 304 response repeats from the full one, RFC 9110 15.4.5
+    NOT_MODIFIED_HEADERS = (
+        'etag', 'last-modified', 'cache-control', 'expires', 'vary', 'content-location', 'set-cookie',
+    )
+
+    def _process_response(self, request: Request, response: Response) -> Response:
+        tagged = self.etag and self._add_etag(request, response)
+        if self.compression is not None:
+            # cached compressed body is reused when the client copy is current
+            self.compression.apply(request, response)
+        if tagged:
+            response = self._check_etag(request, response)
         return response
 
+    @staticmethod
+    def _add_etag(request: Request, response: Response) -> bool:
+        if response.status_code != 200 or response.stream is not None:
+            return False
+        if request.method.upper() not in ('GET', 'HEAD'):
+            return False
+
+        if response.get_single_header('etag') is None:
+            etag = hashlib.blake2b(response.content, digest_size=16).hexdigest()
+            response.set_header('etag', f'"{etag}"')
+        return True
+
+    def _check_etag(self, request: Request, response: Response) -> Response:
+        if_none_match = request.get_header('if-none-match')
+        etag = response.get_single_header('etag')
+        if if_none_match is None or etag is None or not _etag_matches(if_none_match, etag):
+            return response
+
+        not_modified = Response(status_code=304)
+        for key in self.NOT_MODIFIED_HEADERS:
+            values = response.get_header(key)
+            if values:
+                not_modified.set_header(key, list(values))
+        return not_modified
+
+    async def handle_request_async(self, request: Request) -> Response:
+        spec, kwargs = self._router.resolve(request.method, request.path)
+        if spec.cache is not None:
+            cached = spec.cache.get(request)
+            if cached is not None:
+                return cached
+        response = Response(status_code=200)
+        response.raw = await self.invoke_async(request, response, spec.handler, **kwargs)
+        if spec.cache is not None:
+            response.finalize(self.json_dumps)
+            spec.cache.put(request, response)
+        return response
+
+    async def serve_async(self, request: Request) -> Response:
+        """
+        Serves the request on the running event loop, sync dependencies and handlers are called directly
+        """
+        try:
+            response = await self.handle_request_async(request)
+            response.finalize(self.json_dumps)
+        except Exception as e:
+            if not isinstance(e, HttpError):
+                LOG.exception(f'Failed to process handler {e}')
+            response = await self._handle_error_async(e, request)
+        return self._process_response(request, response)
+
+
+# converters of these types return values of the type itself, so they are not applied to subclasses,
+# e.g. str converter would turn StrEnum parameter into plain str
+_EXACT_TYPES = (int, str, bool)
 
-def _list_coercion(type_: type, value: list):
-    assert isinstance(value, list)
-    item_type = typing.get_args(type_)
-    item_type = item_type[0] if item_type else str
-    return [TypeCast.coerce_param(item_type, item) for item in value]
+
+def _find_by_type(registry: dict[type, typing.Any], type_) -> typing.Any:
+    """
+    Value registered for the type or for the closest of its bases
+    """
+    if type_ in registry:
+        return registry[type_]
+    for base in getattr(type_, '__mro__', ())[1:]:
+        if base in registry and base not in _EXACT_TYPES:
+            return registry[base]
+    return None
 
 
 class TypeCast:
-    COERCION = {
+    COERCION: dict[type, typing.Callable[[typing.Any, typing.Any], typing.Any]] = {
         int: lambda _, value: int(value),
         str: lambda _, value: str(value),
         uuid.UUID: lambda _, value: uuid.UUID(value),
         bool: lambda _, value: value.lower() == 'true',
-        list: _list_coercion,
     }
 
+    @classmethod
+    def register(cls, type_: type, coercion: typing.Callable[[typing.Any, typing.Any], typing.Any],
+                 path_regex: str | None = None):
+        """
+        Registers conversion for the type, coercion is called with the type and the raw value.
+        Subclasses of the type are converted too unless they are registered themselves,
+        subclasses of int, str and bool are converted only by the conversion of their other bases.
+        To use the type in path parameters regex matching the path segment should be provided
+        """
+        cls.COERCION[type_] = coercion
+        if path_regex is not None:
+            Router.ROUTE_ATTR_REGEX[type_] = path_regex
+
     @classmethod
     def coerce_param(cls, type_, value):
-        origin_type = cls.get_real_type(type_) or type_
-        if origin_type not in cls.COERCION:
-            raise ValueError(f"Unknown parameter type {type_}")
-        coercion = cls.COERCION[origin_type]
-        try:
-            return coercion(type_, value)
-        except Exception:
-            raise ValueError(f"Failed to convert parameter to type {type_}")
+        return cls.compile(type_)(value)
+
+    @classmethod
+    def compile(cls, type_) -> typing.Callable[[typing.Any], typing.Any]:
+        """
+        Creates function converting raw value to the type, raises ValueError on failure
+        """
+        real_type = cls._unwrap(type_)
+
+        if real_type is list or typing.get_origin(real_type) is list:
+            item_types = typing.get_args(real_type)
+            coerce_item = cls.compile(item_types[0] if item_types else str)
+
+            def coerce_list(value):
+                if not isinstance(value, list):
+                    raise ValueError(f"Failed to convert parameter to type {type_}")
+                return [coerce_item(item) for item in value]
+            return coerce_list
+
+        coercion = cls._find_coercion(real_type)
+        if coercion is None:
+            def unknown(_):
+                raise ValueError(f"Unknown parameter type {type_}")
+            return unknown
+
+        def coerce(value):
+            try:
+                return coercion(real_type, value)
+            except Exception:
+                raise ValueError(f"Failed to convert parameter to type {type_}")
+        return coerce
+
+    @classmethod
+    def _unwrap(cls, type_):
+        while True:
+            if typing.get_origin(type_) is typing.Annotated:
+                type_ = typing.get_args(type_)[0]
+            elif cls.is_optional(type_):
+                type_ = cls.optional_type(type_)
+            else:
+                return type_
+
+    @classmethod
+    def _find_coercion(cls, type_) -> typing.Callable | None:
+        return _find_by_type(cls.COERCION, type_)
 
     @classmethod
     def get_real_type(cls, type_: type):
@@ -501,43 +2199,36 @@ class TypeCast:
 
 @dataclass
 class HttpMethodHandler:
-    def __init__(self, regexp: str, handler: typing.Callable, path: str, method: str, attrs: dict[str, type]):
-        self.regexp = regexp
+    __slots__ = ('handler', 'path', 'method', 'attrs', 'cache', '_coercers')
+
+    def __init__(self, handler: typing.Callable, path: str, method: str, attrs: dict[str, type],
+                 cache: ResponseCache | None = None):
         self.handler = handler
         self.path = path
         self.method = method
         self.attrs = attrs
-        self._re = re.compile('^' + regexp + '$')
-
-    def add_prefix(self, prefix: str) -> 'HttpMethodHandler':
-        return HttpMethodHandler(
-            regexp=prefix + self.regexp,
-            handler=self.handler,
-            path=self.path,
-            method=self.method,
-            attrs=self.attrs
-        )
-
-    def extract_attrs(self, path: str) -> dict:
-        m = self._re.match(path)
-        assert m
+        self.cache = cache
+        self._coercers = [(attr, TypeCast.compile(type_)) for attr, type_ in attrs.items()]
 
+    def extract_attrs(self, values: typing.Sequence[str]) -> dict:
         kv = {}
-        for attr, type_ in self.attrs.items():
-            kv[attr] = TypeCast.coerce_param(type_, m.group(attr))
+        for (attr, coerce), value in zip(self._coercers, values, strict=True):
+            kv[attr] = coerce(value)
         return kv
 
 
+# static segment is matched by value, typed segment by the type regex
+RouteSegment = typing.Union[str, type]
+
+
 class HttpRouteHandler:
-    def __init__(self, regexp: str):
-        self.regexp = regexp
-        self._re = re.compile('^' + regexp + '$')
+    def __init__(self, segments: tuple[RouteSegment, ...], order: int):
+        self.segments = segments
+        self.order = order
         self.method_handlers: dict[str, HttpMethodHandler] = {}
 
-    def is_match(self, path: str) -> bool:
-        return bool(self._re.match(path))
-
-    def get_handler(self, method: str, path: str) -> tuple[typing.Callable, dict[str, typing.Any]]:
+    def get_handler(self, method: str, path: str,
+                    values: typing.Sequence[str] = ()) -> tuple[HttpMethodHandler, dict[str, typing.Any]]:
         method = method.upper()
 
         if Router.HTTP_ANY in self.method_handlers:
@@ -546,8 +2237,27 @@ class HttpRouteHandler:
             raise HttpMethodNotAllowed(f"Method '{method}' not allowed for path '{path}'")
 
         handler = self.method_handlers[method]
-        kwargs = handler.extract_attrs(path)
-        return handler.handler, kwargs
+        kwargs = handler.extract_attrs(values)
+        return handler, kwargs
+
+
+class _RouteNode:
+    """
+    Node of the route tree, one level per path segment
+    """
+    def __init__(self) -> None:
+        self.static: dict[str, _RouteNode] = {}
+        self.typed: dict[type, tuple[typing.Callable, _RouteNode]] = {}
+        self.route: HttpRouteHandler | None = None
+        # the lowest route order in the subtree, allows to skip branches which can not win
+        self.order: int = sys.maxsize
+
+
+class RouteCacheInfo(typing.NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
 
 
 class Router:
@@ -559,10 +2269,19 @@ class Router:
         uuid.UUID: "[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}",
     }
 
-    def __init__(self, prefix: str = ''):
+    def __init__(self, prefix: str = '', cache_size: int = 0):
         self._validate_prefix(prefix)
         self._prefix: str = prefix
-        self._routes: dict[str, HttpRouteHandler] = {}
+        # resolved routes by method and path, disabled when size is 0
+        self.cache_size = cache_size
+        self._cache: OrderedDict[tuple[str, str], tuple] = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._cache_hits = 0
+        self._cache_misses = 0
+        self._routes: dict[tuple[RouteSegment, ...], HttpRouteHandler] = {}
+        self._tree = _RouteNode()
+        # routes without parameters, which are not shadowed by the routes registered earlier
+        self._static: dict[str, HttpRouteHandler] = {}
 
     @classmethod
     def _validate_prefix(cls, prefix: str):
@@ -571,19 +2290,30 @@ class Router:
         if prefix == '/':
             raise ValueError('prefix can not be /')
 
+    @staticmethod
+    def _add_prefix(prefix: str, segments: tuple[RouteSegment, ...]) -> tuple[RouteSegment, ...]:
+        if not prefix:
+            return segments
+        # both prefix and path start with /, so the leading empty segment of the path is dropped
+        return tuple(prefix.split('/')) + segments[1:]
+
     def include(self, router: 'Router', prefix: str = ''):
         self._validate_prefix(prefix)
         prefix = self._prefix + prefix
-        for regexp, route_handler in router._routes.items():
-            new_regexp = prefix + regexp
+        for segments, route_handler in router._routes.items():
+            new_segments = self._add_prefix(prefix, segments)
             for method_handler in route_handler.method_handlers.values():
-                self._add_handler(new_regexp, method_handler.add_prefix(prefix))
+                self._add_handler(new_segments, method_handler)
 
-    def _add_handler(self, regexp: str, spec: HttpMethodHandler):
-        if regexp not in self._routes:
-            self._routes[regexp] = HttpRouteHandler(regexp)
+    def _add_handler(self, segments: tuple[RouteSegment, ...], spec: HttpMethodHandler):
+        if segments not in self._routes:
+            self._routes[segments] = HttpRouteHandler(segments, order=len(self._routes))
+            self._insert(self._routes[segments])
+            self._add_static(self._routes[segments])
 
-        handler = self._routes[regexp]
+        with self._cache_lock:
+            self._cache.clear()
+        handler = self._routes[segments]
         if Router.HTTP_ANY in handler.method_handlers:
             raise ValueError(f"Route for any method on path '{spec.path}' already exists")
         if spec.method in handler.method_handlers:
@@ -593,20 +2323,49 @@ class Router:
                              f"on path '{spec.path}' already exist")
         handler.method_handlers[spec.method] = spec
 
-    def add_route(self, methods: typing.Iterable[str], path: str, handler: typing.Callable):
+    def _insert(self, route: HttpRouteHandler):
+        node = self._tree
+        node.order = min(node.order, route.order)
+        for segment in route.segments:
+            if isinstance(segment, str):
+                node = node.static.setdefault(segment, _RouteNode())
+            else:
+                if segment not in node.typed:
+                    matcher = re.compile(typing.cast(str, self._attr_regex(segment))).fullmatch
+                    node.typed[segment] = (matcher, _RouteNode())
+                node = node.typed[segment][1]
+            node.order = min(node.order, route.order)
+        node.route = route
+
+    def _add_static(self, route: HttpRouteHandler):
+        if not all(isinstance(segment, str) for segment in route.segments):
+            return
+        parts = typing.cast(list[str], list(route.segments))
+        # the new route is the last one, so any other match has been registered earlier
+        match = self._match(self._tree, parts, 0, [], None)
+        if match is not None and match[0] is route:
+            self._static['/'.join(parts)] = route
+
+    @classmethod
+    def _attr_regex(cls, type_: type) -> str | None:
+        return _find_by_type(cls.ROUTE_ATTR_REGEX, type_)
+
+    def add_route(self, methods: typing.Iterable[str], path: str, handler: typing.Callable,
+                  cache: ResponseCache | None = None):
         if not path.startswith('/'):
             raise ValueError('Path should start with /')
+        if inspect.isasyncgenfunction(handler):
+            # responses are streamed by sync adapters, return a sync iterator instead
+            raise ValueError(f'Async generator {handler.__name__} can not be a route handler')
 
         parts = path.split('/')
         attrs = {}
-        handler_regexp_parts = []
-        regexp_parts = []
+        segments: list[RouteSegment] = []
         spec = inspect.signature(handler)
 
         for part in parts:
             if not (part.startswith('{') and part.endswith('}')):
-                handler_regexp_parts.append(re.escape(part))
-                regexp_parts.append(re.escape(part))
+                segments.append(part)
                 continue
 
             part = part[1:-1]
@@ -618,36 +2377,109 @@ class Router:
             attr_spec = spec.parameters[part]
 
             attrs[part] = attr_spec.annotation if attr_spec.annotation is not spec.empty else str
-            try:
-                part_regex = self.ROUTE_ATTR_REGEX[attrs[part]]
-            except KeyError:
+            if self._attr_regex(attrs[part]) is None:
                 raise ValueError(f'Unsupported parameter type {attrs[part]}')
-            handler_regexp_parts.append(f"(?P<{part}>{part_regex})")
-            regexp_parts.append(f"({part_regex})")
+            segments.append(attrs[part])
 
-        handler_regexp = '/'.join(handler_regexp_parts)
-        regexp = '/'.join(regexp_parts)
-        if self._prefix:
-            handler_regexp = self._prefix + handler_regexp
-            regexp = self._prefix + regexp
+        route_segments = self._add_prefix(self._prefix, tuple(segments))
 
         for method in methods:
-            self._add_handler(regexp, HttpMethodHandler(
-                regexp=handler_regexp,
+            self._add_handler(route_segments, HttpMethodHandler(
                 handler=handler,
                 method=method.upper(),
                 attrs=attrs,
-                path=path
+                path=path,
+                cache=cache,
             ))
 
-    @classmethod
-    def _compile_regexp(cls, regexp: str, spec: dict[str, typing.Any]):
-        spec['re'] = re.compile('^' + regexp + '$')
+    def _match(self, node: _RouteNode, parts: list[str], index: int, values: list[str],
+               best: tuple[HttpRouteHandler, list[str]] | None) -> tuple[HttpRouteHandler, list[str]] | None:
+        # routes are matched in the order of registration, so the branch is
+        # skipped when it has no route registered earlier than the best match found
+        if best is not None and node.order >= best[0].order:
+            return best
+
+        if index == len(parts):
+            if node.route is not None and (best is None or node.route.order < best[0].order):
+                return node.route, list(values)
+            return best
+
+        part = parts[index]
+        child = node.static.get(part)
+        if child is not None:
+            best = self._match(child, parts, index + 1, values, best)
+
+        for matcher, typed_child in node.typed.values():
+            if not matcher(part):
+                continue
+            values.append(part)
+            best = self._match(typed_child, parts, index + 1, values, best)
+            values.pop()
+
+        return best
+
+    def handlers(self) -> typing.Iterator[typing.Callable]:
+        for route_handler in self._routes.values():
+            for method_handler in route_handler.method_handlers.values():
+                yield method_handler.handler
+
+    def cache_info(self) -> RouteCacheInfo:
+        return RouteCacheInfo(
+            hits=self._cache_hits,
+            misses=self._cache_misses,
+            maxsize=self.cache_size,
+            currsize=len(self._cache),
+        )
+
+    def cache_clear(self):
+        with self._cache_lock:
+            self._cache.clear()
+            self._cache_hits = 0
+            self._cache_misses = 0
 
     def handle_route(self, method: str, path: str) -> tuple[typing.Callable, dict[str, typing.Any]]:
+        handler, kwargs = self.resolve(method, path)
+        return handler.handler, kwargs
+
+    def resolve(self, method: str, path: str) -> tuple[HttpMethodHandler, dict[str, typing.Any]]:
         method = method.upper()
-        for route_handler in self._routes.values():
-            if not route_handler.is_match(path):
-                continue
-            return route_handler.get_handler(method, path)
-        raise HttpNotFound()
+        if not self.cache_size:
+            return self._resolve_route(method, path)
+
+        key = (method, path)
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache.move_to_end(key)
+                self._cache_hits += 1
+            else:
+                self._cache_misses += 1
+
+        if entry is None:
+            try:
+                handler, kwargs = self._resolve_route(method, path)
+                entry = (handler, kwargs, None)
+            except (HttpNotFound, HttpMethodNotAllowed) as e:
+                entry = (None, None, (type(e), e.message))
+
+            with self._cache_lock:
+                self._cache[key] = entry
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        handler, kwargs, error = entry
+        if error is not None:
+            error_type, message = error
+            raise error_type(message)
+        return handler, kwargs
+
+    def _resolve_route(self, method: str, path: str) -> tuple[HttpMethodHandler, dict[str, typing.Any]]:
+        static_route = self._static.get(path)
+        if static_route is not None:
+            return static_route.get_handler(method, path)
+
+        match = self._match(self._tree, path.split('/'), 0, [], None)
+        if match is None:
+            raise HttpNotFound()
+        route_handler, values = match
+        return route_handler.get_handler(method, path, values)
@@ -1,5 +1,7 @@
+import json
 from io import BytesIO
 
+from chasha import Chasha, Request, Response
 from chasha.contrib.adapters.wsgi import WSGIAdapter
 
 
@@ -93,3 +95,228 @@ def test_body_empty_content_length(app_test_no_body):
 
     body, = WSGIAdapter(app_test_no_body).handler(environ, success_start_response)
     assert body == b'ok'
+
+
+def test_unicode(app: Chasha):
+    @app.get('/')
+    def index():
+        return {'message': 'привет'}
+
+    environ = {
+        'REQUEST_METHOD': 'get',
+        'PATH_INFO': '/',
+    }
+
+    body, = WSGIAdapter(app).handler(environ, lambda *_: None)
+    assert json.loads(body) == {'message': 'привет'}
+
+
+def test_binary(app: Chasha):
+    @app.get('/')
+    def index():
+        return memoryview(b'\x00\xff')
+
+    environ = {
+        'REQUEST_METHOD': 'get',
+        'PATH_INFO': '/',
+    }
+
+    body, = WSGIAdapter(app).handler(environ, lambda *_: None)
+    assert body == b'\x00\xff'
+
+
+def test_stream(app: Chasha):
+    closed = []
+
+    def rows():
+        try:
+            for index in range(3):
+                yield f'{index}\n'
+        finally:
+            closed.append(True)
+
+    @app.get('/')
+    def index(response: Response = app.di.response()):
+        response.set_header('content-type', 'text/csv')
+        return rows()
+
+    environ = {
+        'REQUEST_METHOD': 'get',
+        'PATH_INFO': '/',
+    }
+
+    def start_response(status, headers):
+        assert status == '200 OK'
+        assert ('content-type', 'text/csv') in headers
+
+    body = WSGIAdapter(app).handler(environ, start_response)
+    assert next(iter(body)) == b'0\n'
+    body.close()  # type: ignore
+    assert closed == [True]
+
+
+def test_body_charset(app: Chasha):
+    @app.post('/')
+    def index(body: str = app.di.body()):
+        return body
+
+    data = 'привет'.encode('cp1251')
+    environ = {
+        'REQUEST_METHOD': 'post',
+        'PATH_INFO': '/',
+        'CONTENT_TYPE': 'text/plain; charset=cp1251',
+        'CONTENT_LENGTH': str(len(data)),
+        'wsgi.input': BytesIO(data),
+    }
+
+    body, = WSGIAdapter(app).handler(environ, lambda *_: None)
+    assert body.decode('utf-8') == 'привет'
+
+
+def test_body_not_read(app_test_index):
+    data = BytesIO(b'content')
+    environ = {
+        'REQUEST_METHOD': 'get',
+        'PATH_INFO': '/',
+        'CONTENT_LENGTH': '7',
+        'wsgi.input': data,
+    }
+
+    body, = WSGIAdapter(app_test_index).handler(environ, success_start_response)
+    assert body == b'ok'
+    assert data.tell() == 0
+
+
+class LimitedAdapter(WSGIAdapter):
+    MAX_LENGTH = 10
+    CHUNK_SIZE = 4
+
+
+def echo_app(app: Chasha) -> Chasha:
+    @app.post('/')
+    def index(body: str = app.di.body()):
+        return body
+
+    @app.post('/stream')
+    def stream(request: Request = app.di.request()):
+        return {'chunks': [len(chunk) for chunk in request.stream()]}
+
+    return app
+
+
+def test_body_too_large(app: Chasha):
+    data = BytesIO(b'0' * 11)
+    environ = {
+        'REQUEST_METHOD': 'post',
+        'PATH_INFO': '/',
+        'CONTENT_LENGTH': '11',
+        'wsgi.input': data,
+    }
+    statuses = []
+
+    body, = LimitedAdapter(echo_app(app)).handler(environ, lambda status, _: statuses.append(status))
+    assert statuses == ['413 Request Entity Too Large']
+    assert b'Payload Too Large' in body
+    assert data.tell() == 0
+
+
+def test_body_invalid_length(app: Chasha):
+    environ = {
+        'REQUEST_METHOD': 'post',
+        'PATH_INFO': '/',
+        'CONTENT_LENGTH': 'many',
+        'wsgi.input': BytesIO(b'content'),
+    }
+    statuses = []
+
+    WSGIAdapter(echo_app(app)).handler(environ, lambda status, _: statuses.append(status))
+    assert statuses == ['400 Bad Request']
+
+
+def test_body_chunked(app: Chasha):
+    environ = {
+        'REQUEST_METHOD': 'post',
+        'PATH_INFO': '/',
+        'HTTP_TRANSFER_ENCODING': 'chunked',
+        'wsgi.input': BytesIO(b'4\r\ncont\r\n3;ext=1\r\nent\r\n0\r\nTrailer: value\r\n\r\n'),
+    }
+
+    body, = LimitedAdapter(echo_app(app)).handler(environ, lambda *_: None)
+    assert body == b'content'
+
+
+def test_body_chunked_terminated(app: Chasha):
+    environ = {
+        'REQUEST_METHOD': 'post',
+        'PATH_INFO': '/',
+        'HTTP_TRANSFER_ENCODING': 'chunked',
+        'wsgi.input_terminated': True,
+        'wsgi.input': BytesIO(b'content'),
+    }
+
+    body, = LimitedAdapter(echo_app(app)).handler(environ, lambda *_: None)
+    assert body == b'content'
+
+
+def test_body_chunked_too_large(app: Chasha):
+    environ = {
+        'REQUEST_METHOD': 'post',
+        'PATH_INFO': '/',
+        'HTTP_TRANSFER_ENCODING': 'chunked',
+        'wsgi.input': BytesIO(b'10\r\n0123456789abcdef\r\n0\r\n\r\n'),
+    }
+    statuses = []
+
+    LimitedAdapter(echo_app(app)).handler(environ, lambda status, _: statuses.append(status))
+    assert statuses == ['413 Request Entity Too Large']
+
+
+def test_body_stream(app: Chasha):
+    environ = {
+        'REQUEST_METHOD': 'post',
+        'PATH_INFO': '/stream',
+        'CONTENT_LENGTH': '10',
+        'wsgi.input': BytesIO(b'0123456789'),
+    }
+
+    body, = LimitedAdapter(echo_app(app)).handler(environ, lambda *_: None)
+    assert json.loads(body) == {'chunks': [4, 4, 2]}
+
+
+def test_status_line():
+    assert WSGIAdapter.get_status(200) == '200 OK'
+    assert WSGIAdapter.get_status(413) == '413 Request Entity Too Large'
+    assert WSGIAdapter.get_status(599) == '599 Unknown'
+
+
+def test_headers(monkeypatch):
+    monkeypatch.setattr(WSGIAdapter, '_header_names', {})
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': '/',
+        'SERVER_NAME': 'localhost',
+        'CONTENT_TYPE': 'text/plain',
+        'HTTP_X_FORWARDED_FOR': '127.0.0.1',
+        'HTTP_ACCEPT': '*/*',
+    }
+
+    for _ in range(2):
+        request = WSGIAdapter.adapt_request(environ)
+        assert dict(request.headers) == {
+            'x-forwarded-for': '127.0.0.1',
+            'accept': '*/*',
+            'content-type': 'text/plain',
+        }
+    assert WSGIAdapter._header_names['HTTP_X_FORWARDED_FOR'] == 'x-forwarded-for'
+    assert WSGIAdapter._header_names['SERVER_NAME'] is None
+
+    monkeypatch.setattr(WSGIAdapter, 'MAX_HEADER_NAMES', 0)
+    monkeypatch.setattr(WSGIAdapter, '_header_names', {})
+    request = WSGIAdapter.adapt_request(environ)
+    assert request.get_header('x-forwarded-for') == '127.0.0.1'
+    assert WSGIAdapter._header_names == {}
+
+
+def test_path():
+    assert WSGIAdapter.adapt_request({'REQUEST_METHOD': 'GET', 'PATH_INFO': '//items;1'}).path == '//items;1'
+    assert WSGIAdapter.adapt_request({'REQUEST_METHOD': 'GET', 'PATH_INFO': ''}).path == '/'
@@ -1,5 +1,8 @@
+import asyncio
 import base64
-from chasha.contrib.adapters.yandex import YandexCloudAdapter
+import threading
+from chasha import Chasha, DI, Request, Response
+from chasha.contrib.adapters.yandex import TriggerBatchError, YandexCloudAdapter
 
 
 def test_index(app_test_index):
@@ -92,3 +95,263 @@ def test_body_b64(app_test_body):
     response = YandexCloudAdapter(app_test_body).handler(event, object())
     assert response['statusCode'] == 200
     assert response['body'] == 'ok'
+
+
+def test_async(app: Chasha):
+    loops = []
+
+    async def dependency():
+        loops.append(asyncio.get_running_loop())
+        yield 'ok'
+
+    @app.get('/')
+    async def index(value: str = app.di.inject(dependency)):
+        loops.append(asyncio.get_running_loop())
+        return value
+
+    event = {
+        'httpMethod': 'get',
+        'url': '/',
+    }
+
+    adapter = YandexCloudAdapter(app)
+    for _ in range(2):
+        response = adapter.handler(event, object())
+        assert response['body'] == 'ok'
+    assert len(loops) == 4 and len(set(loops)) == 1
+
+
+def test_binary(app: Chasha):
+    @app.get('/')
+    def index():
+        return b'\x00\xff'
+
+    @app.get('/text')
+    def text():
+        return 'привет'
+
+    adapter = YandexCloudAdapter(app)
+    response = adapter.handler({'httpMethod': 'get', 'url': '/'}, object())
+    assert response['isBase64Encoded'] is True
+    assert base64.b64decode(response['body']) == b'\x00\xff'
+
+    response = adapter.handler({'httpMethod': 'get', 'url': '/text'}, object())
+    assert response['isBase64Encoded'] is False
+    assert response['body'] == 'привет'
+
+
+def test_stream(app: Chasha, monkeypatch):
+    @app.get('/')
+    def index():
+        return app.json_stream(range(3))
+
+    @app.get('/large')
+    def large():
+        return (b'x' * 10 for _ in range(3))
+
+    monkeypatch.setattr(YandexCloudAdapter, 'MAX_BODY_SIZE', 20)
+    adapter = YandexCloudAdapter(app)
+    response = adapter.handler({'httpMethod': 'get', 'url': '/'}, object())
+    assert response['statusCode'] == 200
+    assert response['body'] == '[0,1,2]'
+    assert response['isBase64Encoded'] is False
+
+    response = adapter.handler({'httpMethod': 'get', 'url': '/large'}, object())
+    assert response['statusCode'] == 500
+
+
+def test_request_view():
+    event = {
+        'httpMethod': 'POST',
+        'url': '/items/1?page=2',
+        'path': '/items/{id}',
+        'headers': {
+            'Content-Type': 'application/json',
+            'X-Real-Ip': '127.0.0.1',
+            'accept': 'text/plain',
+        },
+        'queryStringParameters': {'page': '2'},
+        'multiValueQueryStringParameters': {'page': ['2']},
+        'body': '{"name": "value"}',
+        'isBase64Encoded': False,
+    }
+
+    request = YandexCloudAdapter.adapt_request(event)
+    assert request.path == '/items/1'
+    assert request.query is event['queryStringParameters']
+    assert request.get_header('content-type') == 'application/json'
+    assert request.get_header('X-REAL-IP') == '127.0.0.1'
+    assert request.get_header('Accept') == 'text/plain'
+    assert request.get_header('cookie', 'none') == 'none'
+    assert dict(request.headers) == {
+        'content-type': 'application/json',
+        'x-real-ip': '127.0.0.1',
+        'accept': 'text/plain',
+    }
+    assert request.body is event['body']
+    assert request.json() == {'name': 'value'}
+    assert YandexCloudAdapter.adapt_request({'httpMethod': 'GET', 'url': 'https://example.com/a?b=c'}).path == '/a'
+
+
+def test_request_headers_case():
+    event = {
+        'httpMethod': 'GET',
+        'url': '/',
+        'headers': {'X-API-Key': 'secret', 'Content-type': 'text/plain', 'cookie': 'a=1'},
+    }
+
+    request = YandexCloudAdapter.adapt_request(event)
+    assert request.get_header('X-API-Key') == 'secret'
+    assert request.get_header('x-api-key') == 'secret'
+    assert request.get_header('content-type') == 'text/plain'
+    assert request.get_header('Cookie') == 'a=1'
+    assert request.get_header('accept') is None
+    assert {name: request.get_header(name) for name, _ in request.headers} == dict(request.headers)
+
+
+def test_request_missing_header_not_copied():
+    event = {
+        'httpMethod': 'GET',
+        'url': '/',
+        'headers': {'Content-Type': 'text/plain', 'x-real-ip': '127.0.0.1'},
+    }
+
+    request = YandexCloudAdapter.adapt_request(event)
+    assert request.get_header('if-none-match') is None
+    assert request.get_header('authorization', 'none') == 'none'
+    assert request.get_header('X-Real-IP') == '127.0.0.1'
+    assert request._headers is None
+
+
+def test_multi_value_headers(app: Chasha):
+    @app.get('/')
+    def index(response: Response = DI.response()):
+        response.add_header('x-multi', 'first')
+        response.add_header('x-multi', 'second')
+        response.add_header('x-single', 'value')
+        return 'ok'
+
+    response = YandexCloudAdapter(app).handler({'httpMethod': 'get', 'url': '/'}, object())
+    assert response['headers'] == {'content-type': 'text/plain', 'x-single': 'value'}
+    assert response['multiValueHeaders'] == {'x-multi': ['first', 'second']}
+
+
+def queue_message(message_id: str, body: str, queue: str = 'jobs') -> dict:
+    return {
+        'event_metadata': {
+            'event_id': f'event-{message_id}',
+            'event_type': 'yandex.cloud.events.messagequeue.QueueMessage',
+            'created_at': '2026-10-16T10:00:00.000Z',
+        },
+        'details': {
+            'queue_id': f'yrn:yc:ymq:ru-central1:b1gfolder:{queue}',
+            'message': {
+                'message_id': message_id,
+                'body': body,
+                'attributes': {'SentTimestamp': '1791972000000'},
+                'message_attributes': {},
+            },
+        },
+    }
+
+
+def test_queue_messages(app: Chasha):
+    received = []
+
+    @app.post('/queue/jobs')
+    def jobs(data: dict = DI.json_body()):
+        if data['fail']:
+            raise ValueError('job failed')
+        received.append(data['job'])
+
+    event = {
+        'messages': [
+            queue_message('1', '{"job": 1, "fail": false}'),
+            queue_message('2', '{"job": 2, "fail": true}'),
+            queue_message('3', 'not json'),
+            queue_message('4', '{"job": 4, "fail": false}'),
+            queue_message('5', '{}', queue='unknown'),
+        ],
+    }
+
+    response = YandexCloudAdapter(app).handler(event, object())
+    assert received == [1, 4]
+    assert response['processed'] == 2
+    assert [(failure['id'], failure['statusCode']) for failure in response['failures']] == [
+        ('2', 500), ('3', 400), ('5', 404),
+    ]
+
+
+def test_queue_messages_raise_on_failure(app: Chasha):
+    received = []
+
+    @app.post('/queue/jobs')
+    def jobs(body: str = DI.body()):
+        if body == 'fail':
+            raise ValueError('job failed')
+        received.append(body)
+
+    adapter = YandexCloudAdapter(app, raise_on_failure=True)
+    event = {'messages': [queue_message('1', 'first'), queue_message('2', 'fail'), queue_message('3', 'third')]}
+    try:
+        adapter.handler(event, object())
+    except TriggerBatchError as e:
+        failures = e.failures
+    else:
+        raise AssertionError('invocation should fail')
+    # the whole batch is served before the invocation fails
+    assert received == ['first', 'third']
+    assert [(failure['id'], failure['statusCode']) for failure in failures] == [('2', 500)]
+
+    event = {'messages': [queue_message('4', 'fourth')]}
+    assert adapter.handler(event, object()) == {'processed': 1, 'failures': []}
+
+
+def test_timer_messages(app: Chasha):
+    received = []
+
+    @app.post('/cleanup')
+    def cleanup(payload: str = DI.body(), request: Request = DI.request()):
+        received.append((payload, request.raw['details']['trigger_id']))
+
+    event = {
+        'messages': [
+            {
+                'event_metadata': {
+                    'event_id': 'timer-event',
+                    'event_type': 'yandex.cloud.events.serverless.triggers.TimerMessage',
+                    'created_at': '2026-10-16T10:00:00.000Z',
+                },
+                'details': {'trigger_id': 'a1s2d3', 'payload': 'daily'},
+            },
+            {
+                'event_metadata': {
+                    'event_id': 'storage-event',
+                    'event_type': 'yandex.cloud.events.storage.ObjectCreate',
+                },
+                'details': {},
+            },
+        ],
+    }
+
+    response = YandexCloudAdapter(app, trigger_routes={'a1s2d3': '/cleanup'}).handler(event, object())
+    assert received == [('daily', 'a1s2d3')]
+    assert response['processed'] == 1
+    failure, = response['failures']
+    assert failure['id'] == 'storage-event'
+    assert failure['statusCode'] == 500
+
+
+def test_queue_messages_concurrent(app: Chasha):
+    # both messages have to be served at the same time to pass the barrier
+    barrier = threading.Barrier(2, timeout=5)
+
+    @app.post('/queue/jobs')
+    def jobs(body: str = DI.body()):
+        barrier.wait()
+        return body
+
+    event = {'messages': [queue_message('1', 'first'), queue_message('2', 'second')]}
+    adapter = YandexCloudAdapter(app, concurrency=2)
+    for _ in range(2):
+        assert adapter.handler(event, object()) == {'processed': 2, 'failures': []}
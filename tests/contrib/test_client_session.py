@@ -1,5 +1,6 @@
 from chasha import Chasha
-from chasha.contrib.client_session import Session, sign_dict
+from chasha.contrib import client_session
+from chasha.contrib.client_session import Session, SessionData, sign_dict
 
 
 def test_session_get(app: Chasha, app_request):
@@ -66,3 +67,81 @@ def test_session_no_modify(app: Chasha, app_request):
     }))
     assert response.get_header('set-cookie') == []
     assert response.body == 'ok'
+
+
+def test_session_unchanged_not_signed(app: Chasha, app_request, monkeypatch):
+    secret = 'secret'
+    signed = sign_dict({'user_id': 1}, secret=secret)
+    session = Session(secret=secret, cookie='session')
+
+    @app.route('/')
+    def index(data: dict = session.inject()):
+        assert data.get('user_id') == 1
+        return 'ok'
+
+    def fail_sign(*_, **__):
+        raise AssertionError('unchanged session should not be signed')
+
+    monkeypatch.setattr(client_session, 'sign_dict', fail_sign)
+    response = app.serve(app_request(method='get', headers={'Cookie': f'session="{signed}"'}))
+    assert response.get_header('set-cookie') == []
+    assert response.body == 'ok'
+
+
+def test_session_nested_modified(app: Chasha, app_request):
+    secret = 'secret'
+    session = Session(secret=secret, cookie='session')
+
+    @app.route('/')
+    def index(data: SessionData = session.inject()):
+        data['items'].append(2)
+        data.modified = True
+        return 'ok'
+
+    signed = sign_dict({'items': [1]}, secret=secret)
+    response = app.serve(app_request(method='get', headers={'Cookie': f'session="{signed}"'}))
+    cookie, = response.get_header('set-cookie')
+    assert sign_dict({'items': [1, 2]}, secret=secret) in cookie
+
+
+def test_session_verified_cache(app: Chasha, app_request, monkeypatch):
+    secret = 'secret'
+    session = Session(secret=secret, cookie='session')
+    verified = []
+    original_verify = client_session.verify_dict
+
+    def verify_dict(signed: str, *, secret: str) -> dict:
+        verified.append(signed)
+        return original_verify(signed, secret=secret)
+
+    monkeypatch.setattr(client_session, 'verify_dict', verify_dict)
+
+    @app.route('/')
+    def index(data: dict = session.inject()):
+        items = data.get('items', [])
+        data['items'] = items + [len(items)]
+        return {'items': data['items']}
+
+    signed = sign_dict({'items': []}, secret=secret)
+    for _ in range(2):
+        response = app.serve(app_request(method='get', headers={'Cookie': f'session="{signed}"'}))
+        assert response.body == '{"items":[0]}'
+    assert verified == [signed]
+
+    # cookie set by the previous response is already verified
+    cookie, = response.get_header('set-cookie')
+    response = app.serve(app_request(method='get', headers={'Cookie': cookie}))
+    assert response.body == '{"items":[0,1]}'
+    assert verified == [signed]
+
+
+def test_session_invalid_signature(app: Chasha, app_request):
+    session = Session(secret='secret', cookie='session')
+
+    @app.route('/')
+    def index(data: dict = session.inject()):
+        return {'data': data}
+
+    signed = sign_dict({'user_id': 1}, secret='other')
+    response = app.serve(app_request(method='get', headers={'Cookie': f'session="{signed}"'}))
+    assert response.body == '{"data":{}}'
@@ -0,0 +1,146 @@
+import pytest
+
+from chasha import Chasha
+from chasha.contrib.client_session import sign_str
+from chasha.contrib.server_session import (
+    DirectoryStore, MemoryStore, SQLiteStore, ServerSession, ServerSessionData, SessionStore,
+)
+
+
+@pytest.fixture(scope='function', params=['memory', 'sqlite', 'directory'])
+def store(request, tmp_path) -> SessionStore:
+    if request.param == 'memory':
+        return MemoryStore()
+    if request.param == 'sqlite':
+        return SQLiteStore(str(tmp_path / 'sessions.sqlite'))
+    return DirectoryStore(str(tmp_path / 'sessions'))
+
+
+class CountingStore(MemoryStore):
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls: list[str] = []
+
+    def load(self, session_id):
+        self.calls.append('load')
+        return super().load(session_id)
+
+    def save(self, session_id, data):
+        self.calls.append('save')
+        super().save(session_id, data)
+
+
+def test_store(store: SessionStore):
+    assert store.load('missing') is None
+    store.save('session', {'user_id': 1, 'items': [1, 2]})
+    assert store.load('session') == {'user_id': 1, 'items': [1, 2]}
+    store.save('session', {'user_id': 2})
+    assert store.load('session') == {'user_id': 2}
+    store.delete('session')
+    store.delete('session')
+    assert store.load('session') is None
+
+
+def test_session_flow(app: Chasha, app_request, store: SessionStore):
+    session = ServerSession(secret='secret', store=store, cookie='sid')
+
+    @app.post('/login')
+    def login(data: ServerSessionData = session.inject()):
+        data['user_id'] = 1
+        return 'ok'
+
+    @app.get('/me')
+    def me(data: ServerSessionData = session.inject()):
+        return {'user_id': data.get('user_id')}
+
+    @app.post('/logout')
+    def logout(data: ServerSessionData = session.inject()):
+        data.clear()
+        return 'ok'
+
+    response = app.serve(app_request(method='post', path='/login'))
+    cookie, = response.get_header('set-cookie')
+    assert 'HttpOnly' in cookie
+    sid = cookie.split(';')[0]
+
+    response = app.serve(app_request(method='get', path='/me', headers={'cookie': sid}))
+    assert response.body == '{"user_id":1}'
+    assert response.get_header('set-cookie') == []
+
+    app.serve(app_request(method='post', path='/logout', headers={'cookie': sid}))
+    response = app.serve(app_request(method='get', path='/me', headers={'cookie': sid}))
+    assert response.body == '{"user_id":null}'
+
+
+def test_session_lazy_write_back(app: Chasha, app_request):
+    store = CountingStore()
+    session = ServerSession(secret='secret', store=store, cookie='sid')
+    store.save('known', {'visits': 1})
+    store.calls.clear()
+    cookie = f'sid="{sign_str("known", secret="secret")}"'
+
+    @app.get('/untouched')
+    def untouched(data: ServerSessionData = session.inject()):
+        return 'ok'
+
+    @app.get('/read')
+    def read(data: ServerSessionData = session.inject()):
+        return {'visits': data['visits']}
+
+    @app.get('/visit')
+    def visit(data: ServerSessionData = session.inject()):
+        data['visits'] += 1
+        data['visits'] += 1
+        return 'ok'
+
+    app.serve(app_request(method='get', path='/untouched', headers={'cookie': cookie}))
+    assert store.calls == []
+
+    app.serve(app_request(method='get', path='/read', headers={'cookie': cookie}))
+    assert store.calls == ['load']
+
+    store.calls.clear()
+    response = app.serve(app_request(method='get', path='/visit', headers={'cookie': cookie}))
+    assert store.calls == ['load', 'save']
+    assert response.get_header('set-cookie') == []
+    assert store.load('known') == {'visits': 3}
+
+
+def test_session_forged_id(app: Chasha, app_request):
+    store = MemoryStore()
+    store.save('victim', {'user_id': 1})
+    session = ServerSession(secret='secret', store=store, cookie='sid')
+
+    @app.get('/')
+    def index(data: ServerSessionData = session.inject()):
+        return {'user_id': data.get('user_id')}
+
+    forged = sign_str('victim', secret='other')
+    for cookie in (f'sid="{forged}"', 'sid=victim'):
+        response = app.serve(app_request(method='get', headers={'cookie': cookie}))
+        assert response.body == '{"user_id":null}'
+
+
+def test_memory_store_eviction():
+    store = MemoryStore(max_entries=2)
+    for session_id in ('a', 'b'):
+        store.save(session_id, {})
+    store.load('a')
+    store.save('c', {})
+    assert store.load('b') is None
+    assert store.load('a') == {}
+
+
+def test_directory_store_invalid_id(tmp_path):
+    store = DirectoryStore(str(tmp_path))
+    with pytest.raises(ValueError):
+        store.load('../secret')
+
+
+def test_incomplete_store():
+    class ReadOnlyStore(SessionStore):
+        def load(self, session_id: str) -> dict | None:
+            return None
+
+    with pytest.raises(TypeError):
+        ReadOnlyStore()  # type: ignore[abstract]
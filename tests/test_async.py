@@ -0,0 +1,158 @@
+import asyncio
+import json
+import pytest
+from chasha import Chasha, DI, Request
+
+
+def test_async_handler(app: Chasha, app_request):
+    @app.route('/')
+    async def index(request: Request = app.di.request()):
+        await asyncio.sleep(0)
+        return {'path': request.path}
+
+    response = app.serve(app_request(method='get'))
+    assert response.status_code == 200
+    assert json.loads(response.body) == {'path': '/'}
+
+
+def test_loop_reused(app: Chasha, app_request):
+    loops = []
+
+    @app.route('/')
+    async def index():
+        loops.append(asyncio.get_running_loop())
+        return 'ok'
+
+    for _ in range(3):
+        response = app.serve(app_request(method='get'))
+        assert response.body == 'ok'
+    assert len(set(loops)) == 1
+
+
+def test_async_dependencies_concurrent(app: Chasha, app_request):
+    calls = []
+    ready = asyncio.Event()
+
+    async def waiting():
+        calls.append('waiting startup')
+        await asyncio.wait_for(ready.wait(), timeout=1)
+        yield 'waited'
+        calls.append('waiting teardown')
+
+    async def notifying():
+        calls.append('notifying startup')
+        ready.set()
+        yield 'notified'
+        calls.append('notifying teardown')
+
+    def sync_dependency(value: str = app.di.inject(waiting)):
+        yield value + ' sync'
+
+    @app.route('/')
+    async def index(value1: str = app.di.inject(sync_dependency),
+                    value2: str = app.di.inject(notifying)):
+        return f'{value1} {value2}'
+
+    response = app.serve(app_request(method='get'))
+    assert response.body == 'waited sync notified'
+    assert calls == ['waiting startup', 'notifying startup', 'notifying teardown', 'waiting teardown']
+
+
+def test_async_error_handler(app: Chasha, app_request):
+    @app.handle_500()
+    async def on_500(_: Exception, http: DI.StatusCode = app.di.status_code()):
+        await asyncio.sleep(0)
+        http(503)
+        return 'unavailable'
+
+    @app.route('/')
+    async def index():
+        raise KeyError()
+
+    response = app.serve(app_request(method='get'))
+    assert response.status_code == 503
+    assert response.body == 'unavailable'
+
+
+def test_async_singleton(app: Chasha, app_request):
+    calls = []
+
+    async def client():
+        calls.append('startup')
+        yield 'client'
+        calls.append('teardown')
+
+    @app.route('/')
+    def index(value: str = app.di.singleton(client)):
+        return value
+
+    for _ in range(2):
+        response = app.serve(app_request(method='get'))
+        assert response.body == 'client'
+    assert calls == ['startup']
+
+    app.shutdown()
+    assert calls == ['startup', 'teardown']
+
+
+def test_serve_async(app: Chasha, app_request):
+    @app.route('/sync')
+    def sync_index():
+        return 'sync'
+
+    @app.route('/async')
+    async def async_index():
+        return 'async'
+
+    async def serve():
+        return [
+            (await app.serve_async(app_request(method='get', path=path))).body
+            for path in ('/sync', '/async', '/unknown')
+        ]
+
+    sync_body, async_body, not_found = asyncio.run(serve())
+    assert sync_body == 'sync'
+    assert async_body == 'async'
+    assert 'Page not found' in not_found
+
+
+def test_async_generator_handler(app: Chasha):
+    with pytest.raises(ValueError, match='Async generator index can not be a route handler'):
+        @app.route('/')
+        async def index():
+            yield b'chunk'
+
+    with pytest.raises(ValueError, match='Async generator error can not be an exception handler'):
+        @app.exception_handler(Exception)
+        async def error(_: Exception):
+            yield b'chunk'
+
+
+def test_stream_async_dependencies(app: Chasha, app_request):
+    log = []
+
+    async def session():
+        log.append('open')
+        yield 'session'
+        await asyncio.sleep(0)
+        log.append('close')
+
+    @app.route('/')
+    async def index(value: str = app.di.inject(session)):
+        return (f'{value} {index}' for index in range(2))
+
+    response = app.serve(app_request(method='get'))
+    assert log == ['open']
+    assert response.body == 'session 0session 1'
+    assert log == ['open', 'close']
+
+    async def serve():
+        response = await app.serve_async(app_request(method='get'))
+        body = response.body
+        # teardown is scheduled on the running loop
+        await asyncio.sleep(0.01)
+        return body
+
+    log.clear()
+    assert asyncio.run(serve()) == 'session 0session 1'
+    assert log == ['open', 'close']
@@ -0,0 +1,75 @@
+import gzip
+import json
+import zlib
+import pytest
+
+from chasha import Chasha, Compression
+
+
+@pytest.fixture(scope='function')
+def compressed_app():
+    app = Chasha(compression=Compression(min_size=100))
+
+    @app.get('/')
+    def index():
+        return {'items': list(range(100))}
+
+    @app.get('/small')
+    def small():
+        return {'items': []}
+
+    @app.get('/binary')
+    def binary():
+        return b'0' * 1000
+
+    return app
+
+
+def test_gzip(compressed_app: Chasha, app_request):
+    response = compressed_app.serve(app_request(method='get', headers={'Accept-Encoding': 'gzip, deflate'}))
+    assert response.get_single_header('content-encoding') == 'gzip'
+    assert response.get_header('vary') == ['Accept-Encoding']
+    assert response.is_binary
+    assert json.loads(gzip.decompress(response.content)) == {'items': list(range(100))}
+
+
+def test_deflate(compressed_app: Chasha, app_request):
+    response = compressed_app.serve(app_request(method='get', headers={'Accept-Encoding': 'gzip;q=0, deflate'}))
+    assert response.get_single_header('content-encoding') == 'deflate'
+    assert json.loads(zlib.decompress(response.content)) == {'items': list(range(100))}
+
+
+def test_not_accepted(compressed_app: Chasha, app_request):
+    response = compressed_app.serve(app_request(method='get'))
+    assert response.get_single_header('content-encoding') is None
+    assert response.get_header('vary') == ['Accept-Encoding']
+    assert json.loads(response.body) == {'items': list(range(100))}
+
+
+def test_not_compressed(compressed_app: Chasha, app_request):
+    for path in ('/small', '/binary'):
+        response = compressed_app.serve(app_request(method='get', path=path, headers={'Accept-Encoding': 'gzip'}))
+        assert response.get_single_header('content-encoding') is None
+        assert response.get_header('vary') == []
+
+
+def test_cache():
+    compression = Compression(min_size=0, cache_size=1)
+    first = compression._compress('gzip', b'content' * 10)
+    assert compression._compress('gzip', b'content' * 10) is first
+    compression._compress('gzip', b'other')
+    assert compression._compress('gzip', b'content' * 10) is not first
+
+
+@pytest.mark.parametrize('accept_encoding, encoding', [
+    ('gzip', 'gzip'),
+    ('deflate, gzip;q=0.5', 'deflate'),
+    ('deflate, gzip', 'gzip'),
+    ('*', 'gzip'),
+    ('*, gzip;q=0', 'deflate'),
+    ('br', None),
+    ('gzip;q=invalid', None),
+    (None, None),
+])
+def test_negotiate(accept_encoding, encoding):
+    assert Compression.negotiate(accept_encoding) == encoding
@@ -0,0 +1,140 @@
+import datetime
+import gzip
+
+from chasha import DI, Chasha, Compression
+
+
+def test_etag_generated(app_request):
+    app = Chasha(etag=True)
+
+    @app.get('/')
+    def index():
+        return {'value': 1}
+
+    response = app.serve(app_request(method='get'))
+    assert response.status_code == 200
+    etag = response.get_single_header('etag')
+    assert etag is not None and etag.startswith('"') and etag.endswith('"')
+    assert app.serve(app_request(method='get')).get_single_header('etag') == etag
+
+
+def test_etag_not_modified(app_request):
+    app = Chasha(etag=True)
+
+    @app.get('/')
+    def index(cookies=DI.cookies(), response=DI.response()):
+        response.set_header('cache-control', 'max-age=60')
+        cookies.set('seen', '1')
+        return {'value': 1}
+
+    etag = app.serve(app_request(method='get')).get_single_header('etag')
+    assert etag is not None
+
+    for if_none_match in (etag, f'W/{etag}', f'"other", {etag}', '*'):
+        response = app.serve(app_request(method='get', headers={'If-None-Match': if_none_match}))
+        assert response.status_code == 304
+        assert response.content == b''
+        assert response.get_single_header('content-type') is None
+        assert response.get_single_header('etag') == etag
+        assert response.get_single_header('cache-control') == 'max-age=60'
+        assert response.get_header('set-cookie') == ['seen=1; Path=/']
+
+    response = app.serve(app_request(method='get', headers={'If-None-Match': '"other"'}))
+    assert response.status_code == 200
+
+
+def test_etag_skipped(app_request):
+    app = Chasha(etag=True)
+
+    @app.post('/')
+    def create():
+        return {'value': 1}
+
+    @app.get('/missing')
+    def missing():
+        return DI.status_code(404)
+
+    assert app.serve(app_request(method='post')).get_single_header('etag') is None
+    assert app.serve(app_request(method='get', path='/missing')).get_single_header('etag') is None
+    assert Chasha().serve(app_request(method='get')).get_single_header('etag') is None
+
+
+def test_etag_handler_value_kept(app_request):
+    app = Chasha(etag=True)
+
+    @app.get('/')
+    def index(response=DI.response()):
+        response.set_header('etag', '"v1"')
+        return 'content'
+
+    response = app.serve(app_request(method='get', headers={'If-None-Match': '"v1"'}))
+    assert response.status_code == 304
+    assert response.get_single_header('etag') == '"v1"'
+
+
+def test_etag_compressed(app_request):
+    app = Chasha(etag=True, compression=Compression(min_size=10))
+
+    @app.get('/')
+    def index():
+        return 'content' * 10
+
+    response = app.serve(app_request(method='get', headers={'Accept-Encoding': 'gzip'}))
+    etag = response.get_single_header('etag')
+    assert etag is not None and etag.endswith('-gzip"')
+    assert gzip.decompress(response.content) == b'content' * 10
+
+    plain_etag = app.serve(app_request(method='get')).get_single_header('etag')
+    assert plain_etag == etag.replace('-gzip', '')
+
+    headers = {'Accept-Encoding': 'gzip', 'If-None-Match': etag}
+    response = app.serve(app_request(method='get', headers=headers))
+    assert response.status_code == 304
+    assert response.get_single_header('content-encoding') is None
+    assert response.get_single_header('etag') == etag
+
+
+def test_conditional_etag(app, app_request):
+    calls = []
+
+    @app.get('/')
+    def index(conditional=DI.conditional()):
+        conditional(etag='v1')
+        calls.append(1)
+        return 'content'
+
+    response = app.serve(app_request(method='get'))
+    assert response.status_code == 200
+    assert response.get_single_header('etag') == '"v1"'
+
+    response = app.serve(app_request(method='get', headers={'If-None-Match': '"v1"'}))
+    assert response.status_code == 304
+    assert response.content == b''
+    assert response.get_single_header('etag') == '"v1"'
+    assert len(calls) == 1
+
+
+def test_conditional_last_modified(app, app_request):
+    modified = datetime.datetime(2023, 1, 2, 3, 4, 5, 600, tzinfo=datetime.timezone.utc)
+
+    @app.get('/')
+    def index(conditional=DI.conditional()):
+        conditional(last_modified=modified)
+        return 'content'
+
+    response = app.serve(app_request(method='get'))
+    assert response.status_code == 200
+    assert response.get_single_header('last-modified') == 'Mon, 02 Jan 2023 03:04:05 GMT'
+
+    headers = {'If-Modified-Since': 'Mon, 02 Jan 2023 03:04:05 GMT'}
+    assert app.serve(app_request(method='get', headers=headers)).status_code == 304
+
+    headers = {'If-Modified-Since': 'Mon, 02 Jan 2023 03:04:04 GMT'}
+    assert app.serve(app_request(method='get', headers=headers)).status_code == 200
+
+    headers = {'If-Modified-Since': 'invalid'}
+    assert app.serve(app_request(method='get', headers=headers)).status_code == 200
+
+    # If-None-Match takes precedence
+    headers = {'If-Modified-Since': 'Mon, 02 Jan 2023 03:04:05 GMT', 'If-None-Match': '"v1"'}
+    assert app.serve(app_request(method='get', headers=headers)).status_code == 200
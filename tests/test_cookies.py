@@ -0,0 +1,59 @@
+from http.cookies import SimpleCookie
+
+import pytest
+
+from chasha import Chasha, DI
+from chasha.core import format_cookie, parse_cookies
+
+VALUES = ['value', '', 'with space', 'a=b/c+d', 'quote"back\\slash', 'semi;colon', 'привет', '\x00\x7f']
+
+
+@pytest.mark.parametrize('value', VALUES)
+def test_format_compatible(value: str):
+    cookie: SimpleCookie = SimpleCookie()
+    cookie['name'] = value
+    cookie['name']['path'] = '/'
+    cookie['name']['max-age'] = 10
+    cookie['name']['httponly'] = True
+    cookie['name']['samesite'] = 'Lax'
+    cookie['name']['secure'] = True
+
+    expected = cookie['name'].OutputString()
+    assert format_cookie('name', value, path='/', max_age=10, http_only=True, same_site='Lax', secure=True) == expected
+
+
+@pytest.mark.parametrize('value', VALUES)
+def test_parse_compatible(value: str):
+    cookie: SimpleCookie = SimpleCookie()
+    cookie['name'] = value
+    cookie['other'] = 'value'
+    header = f"{cookie['name'].OutputString()}; {cookie['other'].OutputString()}"
+
+    assert parse_cookies(header) == {'name': value, 'other': 'value'}
+
+
+def test_parse_tolerant():
+    header = 'broken; =empty; a=1;; tracker={"json": true}; b="quoted" trailing; c=2'
+    assert parse_cookies(header) == {'a': '1', 'tracker': '{"json": true}', 'b': 'quoted', 'c': '2'}
+
+
+def test_format_invalid():
+    with pytest.raises(ValueError):
+        format_cookie('bad name', 'value')
+    with pytest.raises(ValueError):
+        format_cookie('name', 'value', same_site='Sometimes')
+
+
+def test_cookies_attributes(app: Chasha, app_request):
+    @app.get('/')
+    def index(cookies: DI.Cookies = DI.cookies()):
+        cookies.set('session', cookies.get('session') or '', http_only=True, same_site='Strict', secure=True)
+        cookies.set('theme', 'dark', max_age=3600)
+        cookies.set('theme', 'light', max_age=3600)
+        return 'ok'
+
+    response = app.serve(app_request(method='get', headers={'cookie': 'garbage; session=abc'}))
+    assert response.get_header('set-cookie') == [
+        'session=abc; HttpOnly; Path=/; SameSite=Strict; Secure',
+        'theme=light; Max-Age=3600; Path=/',
+    ]
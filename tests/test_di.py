@@ -1,4 +1,6 @@
-from chasha import Chasha, Request
+import inspect
+import pytest
+from chasha import Chasha, DI, InjectContext, Request
 
 
 def test_di(app: Chasha, app_request):
@@ -73,3 +75,184 @@ def test_empty_json_body(app: Chasha, app_request):
     response = app.serve(app_request(method='get', body=''))
     assert response.status_code == 400
     assert 'Failed to load payload' in response.body
+
+
+def test_context(app: Chasha, app_request):
+    def dependency(context: InjectContext):
+        yield (context.param_name, context.param_type)
+
+    @app.route('/')
+    def index(context: InjectContext, value: tuple = app.di.inject(dependency)):
+        assert context.param_name is None
+        assert isinstance(context.request, Request)
+        assert value == ('value', tuple)
+        return 'ok'
+
+    response = app.serve(app_request(method='get'))
+    assert response.body == 'ok'
+
+
+def test_teardown_order(app: Chasha, app_request):
+    calls = []
+
+    def dependency1():
+        calls.append('dep1 startup')
+        yield 'dep1'
+        calls.append('dep1 teardown')
+
+    def dependency2(dep: str = app.di.inject(dependency1)):
+        calls.append('dep2 startup')
+        yield dep + 'dep2'
+        calls.append('dep2 teardown')
+
+    @app.route('/')
+    def index(value: str = app.di.inject(dependency2)):
+        calls.append('handler')
+        return 'ok'
+
+    response = app.serve(app_request(method='get'))
+    assert response.body == 'ok'
+    assert calls == ['dep1 startup', 'dep2 startup', 'handler', 'dep2 teardown', 'dep1 teardown']
+
+
+def test_signature_compiled_once(app: Chasha, app_request, monkeypatch):
+    def dependency(request: Request = app.di.request()):
+        yield request.path
+
+    @app.route('/')
+    def index(value: str = app.di.inject(dependency)):
+        return value
+
+    signature = inspect.signature
+    calls = []
+
+    def counting_signature(*args, **kwargs):
+        calls.append(args)
+        return signature(*args, **kwargs)
+
+    monkeypatch.setattr(inspect, 'signature', counting_signature)
+    for _ in range(3):
+        response = app.serve(app_request(method='get'))
+        assert response.body == '/'
+    assert calls == []
+
+
+def test_singleton(app: Chasha, app_request):
+    calls = []
+
+    def config():
+        calls.append('config startup')
+        yield {'dsn': 'sqlite://'}
+        calls.append('config teardown')
+
+    def client(cfg: dict = app.di.singleton(config)):
+        calls.append('client startup')
+        yield f"client {cfg['dsn']}"
+        calls.append('client teardown')
+
+    def request_dependency(value: str = app.di.singleton(client)):
+        yield value
+
+    @app.route('/')
+    def index(value: str = app.di.singleton(client)):
+        return value
+
+    @app.route('/nested')
+    def nested(value: str = app.di.inject(request_dependency)):
+        return value
+
+    for path in ('/', '/nested', '/'):
+        response = app.serve(app_request(method='get', path=path))
+        assert response.body == 'client sqlite://'
+    assert calls == ['config startup', 'client startup']
+
+    app.shutdown()
+    assert calls == ['config startup', 'client startup', 'client teardown', 'config teardown']
+
+    response = app.serve(app_request(method='get'))
+    assert response.body == 'client sqlite://'
+    assert calls[-2:] == ['config startup', 'client startup']
+
+
+def test_singleton_warmup(app: Chasha, app_request):
+    calls = []
+
+    def client():
+        calls.append('startup')
+        yield 'client'
+
+    @app.route('/')
+    def index(value: str = app.di.singleton(client)):
+        return value
+
+    app.warmup()
+    assert calls == ['startup']
+
+    response = app.serve(app_request(method='get'))
+    assert response.body == 'client'
+    assert calls == ['startup']
+
+
+def test_singleton_request_dependency(app: Chasha):
+    def client(request: Request = app.di.request()):
+        yield request.path
+
+    with pytest.raises(ValueError) as e:
+        @app.route('/')
+        def index(value: str = app.di.singleton(client)):
+            return value
+    assert e.match('Singleton client can only depend on other singletons')
+
+
+def test_dependency_resolved_once(app: Chasha, app_request):
+    calls = []
+
+    def get_user(cookies: DI.Cookies = app.di.cookies()):
+        calls.append('startup')
+        yield cookies.get('user')
+        calls.append('teardown')
+
+    def permissions(user: str = app.di.inject(get_user), cookies: DI.Cookies = app.di.cookies()):
+        yield [user, cookies.get('role')]
+
+    def profile(user: str = app.di.inject(get_user), request: Request = app.di.request()):
+        yield {'user': user, 'path': request.path}
+
+    @app.route('/')
+    def index(user: str = app.di.inject(get_user),
+              user_permissions: list = app.di.inject(permissions),
+              user_profile: dict = app.di.inject(profile),
+              cookies: DI.Cookies = app.di.cookies()):
+        assert user == 'admin'
+        assert user_permissions == ['admin', 'owner']
+        assert user_profile == {'user': 'admin', 'path': '/'}
+        cookies.set('seen', 'true')
+        return 'ok'
+
+    response = app.serve(app_request(method='get', headers={'cookie': 'user=admin; role=owner'}))
+    assert response.body == 'ok'
+    assert calls == ['startup', 'teardown']
+    assert response.get_header('set-cookie') == ['seen=true; Path=/']
+
+
+def test_bound_dependency_resolved_once(app: Chasha, app_request):
+    calls = []
+
+    def get_user(token: str = app.di.query()):
+        calls.append(token)
+        yield token
+
+    def permissions(user: str = app.di.inject(get_user)):
+        yield [user]
+
+    @app.route('/')
+    def index(user: str = app.di.inject(get_user), user_permissions: list = app.di.inject(permissions)):
+        return {'user': user, 'permissions': user_permissions}
+
+    spec, _ = app._router.resolve('GET', '/')
+    # get_user and its query parameter are shared by the handler and permissions
+    assert len(app._get_plan(spec.handler).steps) == 3
+
+    response = app.serve(app_request(method='get', query={'token': 'admin'}))
+    assert response.body == '{"user":"admin","permissions":["admin"]}'
+    assert calls == ['admin']
@@ -0,0 +1,168 @@
+import pytest
+
+from chasha import DI, Chasha, HttpPayloadTooLarge, InjectContext, Request, Response, UploadFile
+from chasha.core import MultipartParser
+
+BOUNDARY = '----chasha'
+
+
+def multipart(*parts: tuple[str, str | None, bytes]) -> bytes:
+    body = b''
+    for name, filename, content in parts:
+        disposition = f'form-data; name="{name}"'
+        headers = ''
+        if filename is not None:
+            disposition += f'; filename="{filename}"'
+            headers = 'Content-Type: text/plain\r\n'
+        body += f'--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n{headers}\r\n'.encode() + content + b'\r\n'
+    return body + f'--{BOUNDARY}--\r\n'.encode()
+
+
+def multipart_request(body: bytes) -> Request:
+    return Request(
+        method='post',
+        headers={'Content-Type': f'multipart/form-data; boundary={BOUNDARY}'},
+        body=body,
+    )
+
+
+def test_urlencoded_form(app: Chasha, app_request):
+    @app.post('/')
+    def index(count: int = DI.form(), tags: list[str] = DI.form(name='tag'), note: str | None = DI.form()):
+        return {'count': count, 'tags': tags, 'note': note}
+
+    response = app.serve(app_request(
+        method='post',
+        headers={'Content-Type': 'application/x-www-form-urlencoded'},
+        body='count=2&tag=a&tag=b',
+    ))
+    assert response.body == '{"count":2,"tags":["a","b"],"note":null}'
+
+    response = app.serve(app_request(method='post', body='tag=a'))
+    assert response.status_code == 400
+
+
+def test_form_dependency_context():
+    request = Request(method='POST', headers={'Content-Type': 'application/x-www-form-urlencoded'}, body='count=2')
+    context = InjectContext(param_name='count', param_type=int, request=request, response=Response())
+    form = request.form(), request.files()
+
+    assert next(DI.form().generator(context, form=form)) == 2
+    context.param_name, context.param_type = 'upload', list[UploadFile]
+    assert next(DI.files().generator(context, form=form)) == []
+
+
+def test_multipart_form(app: Chasha):
+    closed = []
+
+    @app.post('/')
+    def index(title: str = DI.form(),
+              count: int = DI.form(),
+              upload: UploadFile = DI.files(),
+              attachments: list[UploadFile] = DI.files(name='attachment')):
+        closed.extend([upload, *attachments])
+        return {
+            'title': title,
+            'count': count,
+            'upload': [upload.filename, upload.content_type, upload.read().decode()],
+            'attachments': [attachment.read().decode() for attachment in attachments],
+        }
+
+    body = multipart(
+        ('title', None, 'Заголовок'.encode()),
+        ('count', None, b'3'),
+        ('upload', 'a; b.txt', b'first\r\nline'),
+        ('attachment', 'one.txt', b'1'),
+        ('attachment', 'two.txt', b'2'),
+    )
+    response = app.serve(multipart_request(body))
+    assert response.body == (
+        '{"title":"Заголовок","count":3,"upload":["a; b.txt","text/plain","first\\r\\nline"],'
+        '"attachments":["1","2"]}'
+    )
+    assert all(upload.file.closed for upload in closed)
+
+
+def test_multipart_missing_file(app: Chasha):
+    @app.post('/')
+    def index(upload: UploadFile = DI.files(), extra: list[UploadFile] = DI.files()):
+        return 'ok'
+
+    response = app.serve(multipart_request(multipart(('title', None, b'value'))))
+    assert response.status_code == 400
+
+
+def test_multipart_invalid(app: Chasha):
+    @app.post('/')
+    def index(title: str = DI.form()):
+        return title
+
+    response = app.serve(multipart_request(multipart(('title', None, b'value'))[:-10]))
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 7, 64, 1024])
+def test_parser_chunks(chunk_size: int):
+    content = bytes(range(256)) * 20
+    body = multipart(('field', None, b'value'), ('file', 'data.bin', content), ('field', None, b'other'))
+
+    parser = MultipartParser(BOUNDARY, max_memory_size=1000)
+    for index in range(0, len(body), chunk_size):
+        parser.feed(body[index:index + chunk_size])
+    parser.close()
+
+    assert parser.fields == {'field': ['value', 'other']}
+    upload = parser.files['file']
+    assert upload.size == len(content)
+    assert upload.read() == content
+    # content larger than the memory limit is moved to the disk
+    assert upload.file._rolled
+    upload.close()
+
+
+def test_parser_field_too_large():
+    parser = MultipartParser(BOUNDARY, max_field_size=4)
+    with pytest.raises(HttpPayloadTooLarge):
+        parser.feed(multipart(('field', None, b'too large')))
+
+
+def test_parser_memory_budget():
+    content = b'x' * 600
+    body = multipart(*((f'file{index}', 'data.bin', content) for index in range(4)))
+
+    parser = MultipartParser(BOUNDARY, max_memory_size=1000, max_total_memory_size=1500)
+    for index in range(0, len(body), 100):
+        parser.feed(body[index:index + 100])
+    parser.close()
+
+    uploads = [parser.files[f'file{index}'] for index in range(4)]
+    # files after the first two do not fit into the memory of the request
+    assert [upload.in_memory for upload in uploads] == [True, True, False, False]
+    assert [upload.file._rolled for upload in uploads] == [False, False, True, True]
+    for upload in uploads:
+        assert upload.read() == content
+        upload.close()
+
+
+@pytest.mark.parametrize('limit, parts', [
+    ({'max_fields': 2}, [('a', None, b'1'), ('b', None, b'2'), ('c', None, b'3')]),
+    ({'max_files': 1}, [('a', 'a.txt', b'1'), ('b', 'b.txt', b'2')]),
+    ({'max_fields_size': 5}, [('a', None, b'123'), ('b', None, b'456')]),
+])
+def test_parser_limits(limit: dict, parts: list):
+    parser = MultipartParser(BOUNDARY, **limit)
+    with pytest.raises(HttpPayloadTooLarge):
+        parser.feed(multipart(*parts))
+    parser.cleanup()
+
+
+def test_urlencoded_form_limits(monkeypatch):
+    monkeypatch.setattr(Request, 'MAX_FORM_FIELDS', 2)
+    request = Request(method='post', body='a=1&b=2&c=3')
+    with pytest.raises(HttpPayloadTooLarge):
+        request.form()
+
+    monkeypatch.setattr(Request, 'MAX_FORM_FIELDS_SIZE', 5)
+    request = Request(method='post', body='a=123456')
+    with pytest.raises(HttpPayloadTooLarge):
+        request.form()
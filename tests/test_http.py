@@ -1,5 +1,8 @@
 import json
-from chasha import Chasha, DI, Request, HttpNotFound, HttpRedirect
+import typing
+import pytest
+from chasha import Chasha, DI, Request, Response, HttpNotFound, HttpRedirect
+from chasha.core import orjson_dumps, std_json_dumps
 
 
 def test_ok(app: Chasha, app_request):
@@ -142,3 +145,278 @@ def test_error_in_500_handler(app: Chasha, app_request):
     response = app.serve(app_request(method='get'))
     assert response.status_code == 500
     assert response.body == ''
+
+
+def test_error_handler_mro_order(app: Chasha, app_request):
+    class Special(Exception):
+        pass
+
+    class SpecialNotFound(Special, HttpNotFound):
+        pass
+
+    @app.handle_404()
+    def on_404(_: HttpNotFound):
+        return 'not found'
+
+    @app.exception_handler(Special)
+    def on_special(_: Special):
+        return 'special'
+
+    @app.route('/')
+    def index():
+        raise SpecialNotFound()
+
+    response = app.serve(app_request(method='get'))
+    assert response.body == 'special'
+
+
+def test_error_handler_cache_reset(app: Chasha, app_request):
+    @app.route('/')
+    def index():
+        raise KeyError()
+
+    response = app.serve(app_request(method='get'))
+    assert response.body == ''
+
+    @app.exception_handler(LookupError)
+    def on_lookup_error(_: LookupError):
+        return 'lookup error'
+
+    response = app.serve(app_request(method='get'))
+    assert response.body == 'lookup error'
+
+
+def test_json_dumps(app_request):
+    app = Chasha(json_dumps=lambda value: b'{"custom":true}')
+
+    @app.route('/')
+    def index():
+        return {'status': 'ok'}
+
+    response = app.serve(app_request(method='get'))
+    assert response.content == b'{"custom":true}'
+    assert response.body == '{"custom":true}'
+
+
+def test_std_json_dumps():
+    assert std_json_dumps({'key': [1, 'значение', None]}) == '{"key":[1,"значение",null]}'.encode('utf-8')
+    assert std_json_dumps({'key': '\ud800'}) == b'{"key":"\\ud800"}'
+
+
+def test_json_lone_surrogate(app: Chasha, app_request):
+    @app.route('/')
+    def index():
+        return {'key': '\ud800'}
+
+    response = app.serve(app_request(method='get'))
+    assert response.status_code == 200
+    assert json.loads(response.content) == {'key': '\ud800'}
+
+
+def test_orjson_dumps():
+    pytest.importorskip('orjson')
+    assert orjson_dumps({1: 'int key'}) == b'{"1":"int key"}'
+    assert orjson_dumps({'big': 2 ** 70}) == b'{"big":1180591620717411303424}'
+
+
+def test_bytes(app: Chasha, app_request):
+    @app.route('/')
+    def index():
+        return b'\x89PNG'
+
+    @app.route('/image')
+    def image(response: Response = app.di.response()):
+        response.set_header('content-type', 'image/png')
+        return memoryview(b'\x89PNG')
+
+    response = app.serve(app_request(method='get'))
+    assert response.is_binary
+    assert response.get_single_header('Content-Type') == 'application/octet-stream'
+    assert response.content == b'\x89PNG'
+
+    response = app.serve(app_request(method='get', path='/image'))
+    assert response.get_single_header('Content-Type') == 'image/png'
+    assert bytes(response.content) == b'\x89PNG'
+
+
+def test_charset(app: Chasha, app_request):
+    @app.route('/')
+    def index(response: Response = app.di.response()):
+        response.charset = 'cp1251'
+        return 'привет'
+
+    response = app.serve(app_request(method='get'))
+    assert response.get_single_header('Content-Type') == 'text/plain; charset=cp1251'
+    assert response.content == 'привет'.encode('cp1251')
+    assert response.body == 'привет'
+
+
+def test_stream(app: Chasha, app_request):
+    @app.route('/')
+    def index():
+        yield 'line 1\n'
+        yield b'line 2\n'
+
+    @app.route('/json')
+    def json_stream():
+        return app.json_stream({'id': index} for index in range(3))
+
+    response = app.serve(app_request(method='get'))
+    assert response.get_single_header('Content-Type') == 'application/octet-stream'
+    assert list(response.iter_content()) == [b'line 1\n', b'line 2\n']
+
+    response = app.serve(app_request(method='get', path='/json'))
+    assert response.get_single_header('Content-Type') == 'application/json'
+    assert response.stream is not None
+    assert json.loads(response.body) == [{'id': 0}, {'id': 1}, {'id': 2}]
+
+
+def test_stream_dependencies(app: Chasha, app_request):
+    log = []
+
+    def cursor():
+        log.append('open')
+        try:
+            yield iter(['a', 'b'])
+            log.append('close')
+        except GeneratorExit:
+            log.append('abort')
+            raise
+
+    @app.route('/')
+    def index(rows=DI.inject(cursor)):
+        for row in rows:
+            log.append(f'chunk {row}')
+            yield row
+
+    @app.route('/json')
+    def json_rows(rows=DI.inject(cursor)):
+        return app.json_stream(rows)
+
+    @app.route('/fail')
+    def fail(rows=DI.inject(cursor)):
+        yield next(rows)
+        raise ValueError()
+
+    response = app.serve(app_request(method='get'))
+    assert log == ['open']
+    assert response.body == 'ab'
+    assert log == ['open', 'chunk a', 'chunk b', 'close']
+
+    log.clear()
+    response = app.serve(app_request(method='get', path='/json'))
+    assert response.body == '["a","b"]'
+    assert log == ['open', 'close']
+
+    # the client went away, the server closes the stream
+    log.clear()
+    response = app.serve(app_request(method='get'))
+    assert response.stream is not None
+    assert next(response.stream) == b'a'
+    typing.cast(typing.Generator, response.stream).close()
+    assert log == ['open', 'chunk a', 'close']
+
+    log.clear()
+    response = app.serve(app_request(method='get', path='/fail'))
+    with pytest.raises(ValueError):
+        _ = response.content
+    assert log == ['open', 'abort']
+
+
+def test_request_lazy():
+    class LazyRequest(Request):
+        loaded = []
+
+        def _load_query(self):
+            self.loaded.append('query')
+            return {'param': 'value'}
+
+        def _load_headers(self):
+            self.loaded.append('headers')
+            return {'content-type': 'text/plain; charset=cp1251', 'cookie': 'key=value'}
+
+        def _load_content(self):
+            self.loaded.append('content')
+            return 'привет'.encode('cp1251')
+
+    request = LazyRequest(method='get')
+    assert LazyRequest.loaded == []
+
+    assert request.body == 'привет'
+    assert request.body == 'привет'
+    assert request.get_cookie('key') == 'value'
+    assert request.query == {'param': 'value'}
+    assert request.query == {'param': 'value'}
+    assert LazyRequest.loaded == ['content', 'headers', 'query']
+
+
+def test_request_body():
+    request = Request(method='post', headers={'Content-Type': 'application/json'}, body=b'{"key": [1]}')
+    assert request.json() == {'key': [1]}
+    assert request.json() is request.json()
+
+    request.body = 'key=1&key=2&other=&name=value'
+    assert request.content == b'key=1&key=2&other=&name=value'
+    assert request.form() == {'key': ['1', '2'], 'other': '', 'name': 'value'}
+
+
+def test_json_body_parsed_once(app: Chasha, app_request, monkeypatch):
+    loads = []
+    original_loads = json.loads
+    def counting_loads(data):
+        loads.append(data)
+        return original_loads(data)
+
+    monkeypatch.setattr(json, 'loads', counting_loads)
+
+    def dependency(payload: dict = DI.json_body()):
+        yield payload['key']
+
+    @app.post('/')
+    def index(payload: dict = DI.json_body(), key: int = DI.inject(dependency), request=DI.request()):
+        assert request.json() is payload
+        return {'key': key}
+
+    response = app.serve(app_request(method='post', body='{"key": 1}'))
+    assert response.body == '{"key":1}'
+    assert loads == ['{"key": 1}']
+
+    response = app.serve(app_request(method='post', body='{"key"'))
+    assert response.status_code == 400
+
+
+def test_response_headers():
+    response = Response()
+    assert not hasattr(response, '__dict__')
+    assert list(response.headers) == []
+    assert list(response.header_values()) == []
+    assert response.get_header('x-missing') == []
+
+    response.set_header('Content-Type', 'text/plain')
+    response.add_header('Set-Cookie', 'a=1')
+    response.add_header('Set-Cookie', 'b=2')
+    response.apply_cookies()
+
+    assert response.get_single_header('content-type') == 'text/plain'
+    assert response.get_header('set-cookie') == ['a=1', 'b=2']
+    assert list(response.headers) == [('content-type', ['text/plain']), ('set-cookie', ['a=1', 'b=2'])]
+    assert list(response.header_items()) == [
+        ('content-type', 'text/plain'), ('set-cookie', 'a=1'), ('set-cookie', 'b=2'),
+    ]
+    assert list(response.header_values()) == [('content-type', 'text/plain'), ('set-cookie', ['a=1', 'b=2'])]
+
+
+def test_request_stream():
+    class StreamRequest(Request):
+        def _load_stream(self):
+            yield b'con'
+            yield b'tent'
+
+    request = StreamRequest(method='post')
+    assert list(request.stream()) == [b'con', b'tent']
+    with pytest.raises(RuntimeError):
+        _ = request.content
+
+    request = Request(method='post', body='content')
+    assert list(request.stream()) == [b'content']
+    assert request.body == 'content'
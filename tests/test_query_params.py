@@ -1,8 +1,12 @@
+import datetime
+import enum
 import uuid
 import pytest
 import typing
 
 from chasha import Chasha, HttpBadRequest
+from chasha import TypeCast
+from chasha.core import Router
 
 
 def test_params_injected(app: Chasha, app_request):
@@ -134,3 +138,92 @@ def test_unsupported_type_type_cast(app: Chasha, app_request):
             'param': 'not an MyType',
         }))
     assert e.match('Failed to convert parameter param')
+
+
+def test_annotated_list_type_cast(app: Chasha, app_request):
+    @app.route('/')
+    def index(param: typing.Annotated[list[int] | None, 'ids'] = app.di.query()):
+        assert param == [1, 2]
+        return 'ok'
+
+    response = app.serve(app_request(method='get', query={'param': ['1', '2']}))
+    assert response.body == 'ok'
+
+
+def test_registered_type_cast(app: Chasha, app_request, monkeypatch):
+    class Color(enum.Enum):
+        RED = 'red'
+        GREEN = 'green'
+
+    monkeypatch.setattr(TypeCast, 'COERCION', dict(TypeCast.COERCION))
+    monkeypatch.setattr(Router, 'ROUTE_ATTR_REGEX', dict(Router.ROUTE_ATTR_REGEX))
+    TypeCast.register(float, lambda _, value: float(value))
+    TypeCast.register(datetime.date, lambda _, value: datetime.date.fromisoformat(value))
+    TypeCast.register(enum.Enum, lambda type_, value: type_(value), path_regex='[a-z]+')
+
+    @app.route('/{color}')
+    def index(color: Color,
+              ratio: float = app.di.query(),
+              day: datetime.date = app.di.query(),
+              colors: list[Color] = app.di.query()):
+        assert color is Color.RED
+        assert ratio == 0.5
+        assert day == datetime.date(2023, 1, 31)
+        assert colors == [Color.GREEN, Color.RED]
+        return 'ok'
+
+    def not_compiled(*args, **kwargs):
+        raise AssertionError('types should be compiled when the route is registered')
+
+    monkeypatch.setattr(TypeCast, 'get_real_type', not_compiled)
+    monkeypatch.setattr(TypeCast, 'is_optional', not_compiled)
+
+    response = app.serve(app_request(method='get', path='/red', query={
+        'ratio': '0.5',
+        'day': '2023-01-31',
+        'colors': ['green', 'red'],
+    }))
+    assert response.body == 'ok'
+
+    with pytest.raises(HttpBadRequest) as e:
+        app.handle_request(app_request(method='get', path='/red', query={
+            'ratio': '0.5',
+            'day': '2023-01-31',
+            'colors': ['blue'],
+        }))
+    assert e.match('Failed to convert parameter colors')
+
+
+def test_builtin_subclass_type_cast(app: Chasha, app_request, monkeypatch):
+    class Color(str, enum.Enum):
+        RED = 'red'
+
+    class Level(enum.IntEnum):
+        LOW = 1
+
+    monkeypatch.setattr(TypeCast, 'COERCION', dict(TypeCast.COERCION))
+    monkeypatch.setattr(Router, 'ROUTE_ATTR_REGEX', dict(Router.ROUTE_ATTR_REGEX))
+
+    with pytest.raises(ValueError, match='Unsupported parameter type'):
+        @app.route('/{color}')
+        def unsupported(color: Color):
+            pass
+
+    @app.route('/query')
+    def query(level: Level = app.di.query()):
+        return 'ok'
+
+    with pytest.raises(HttpBadRequest):
+        app.handle_request(app_request(method='get', path='/query', query={'level': '1'}))
+
+    TypeCast.register(enum.Enum, lambda type_, value: type_(int(value) if issubclass(type_, int) else value),
+                      path_regex='[a-z]+')
+
+    @app.route('/levels/{color}')
+    def index(color: Color, level: Level = app.di.query()):
+        assert type(color) is Color and color is Color.RED
+        assert type(level) is Level and level is Level.LOW
+        return 'ok'
+
+    response = app.serve(app_request(method='get', path='/levels/red', query={'level': '1'}))
+    assert response.body == 'ok'
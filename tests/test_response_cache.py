@@ -0,0 +1,182 @@
+import asyncio
+import pytest
+
+import chasha.core
+from chasha import DI, Chasha, Chashka, Compression, ResponseCache
+
+
+@pytest.fixture(scope='function')
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(chasha.core.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_cached(app: Chasha, app_request, clock):
+    calls = []
+    cache = ResponseCache(ttl=10)
+
+    @app.get('/items', cache=cache)
+    def items(page: int = DI.query()):
+        calls.append(page)
+        return {'page': page}
+
+    for _ in range(3):
+        response = app.serve(app_request(method='get', path='/items', query={'page': '1'}))
+        assert response.status_code == 200
+        assert response.body == '{"page":1}'
+        assert response.get_single_header('content-type') == 'application/json'
+    assert calls == [1]
+
+    app.serve(app_request(method='get', path='/items', query={'page': '2'}))
+    assert calls == [1, 2]
+
+    info = cache.cache_info()
+    assert (info.hits, info.misses, info.currsize, info.nbytes) == (2, 2, 2, 20)
+
+    clock[0] += 10
+    app.serve(app_request(method='get', path='/items', query={'page': '1'}))
+    assert calls == [1, 2, 1]
+
+    cache.cache_clear()
+    assert cache.cache_info() == (0, 0, 128, 0, 0)
+
+
+def test_query_normalized(app: Chasha, app_request, clock):
+    calls = []
+
+    @app.get('/', cache=ResponseCache(ttl=10))
+    def index(request=DI.request()):
+        calls.append(1)
+        return 'index'
+
+    app.serve(app_request(method='get', query={'a': '1', 'b': '2'}))
+    app.serve(app_request(method='get', query={'b': '2', 'a': '1'}))
+    assert len(calls) == 1
+    app.serve(app_request(method='get', query={'a': ['1', '2']}))
+    assert len(calls) == 2
+
+
+def test_vary(app: Chasha, app_request, clock):
+    @app.get('/', cache=ResponseCache(ttl=10, vary=['Accept-Language']))
+    def index(request=DI.request()):
+        return request.get_header('accept-language') or ''
+
+    response = app.serve(app_request(method='get', headers={'Accept-Language': 'en'}))
+    assert response.body == 'en'
+    response = app.serve(app_request(method='get', headers={'Accept-Language': 'ru'}))
+    assert response.body == 'ru'
+    response = app.serve(app_request(method='get', headers={'Accept-Language': 'en'}))
+    assert response.body == 'en'
+
+
+def test_not_cached(app: Chasha, app_request, clock):
+    calls = []
+    cache = ResponseCache(ttl=10)
+
+    @app.get('/cookie', cache=cache)
+    def cookie(cookies=DI.cookies()):
+        calls.append('cookie')
+        cookies.set('session', '1')
+        return 'cookie'
+
+    @app.get('/missing', cache=cache)
+    def missing():
+        calls.append('missing')
+        return DI.status_code(404)
+
+    @app.get('/private', cache=cache)
+    def private(response=DI.response()):
+        calls.append('private')
+        response.set_header('cache-control', 'private, max-age=10')
+        return 'private'
+
+    for _ in range(2):
+        assert app.serve(app_request(method='get', path='/cookie')).get_header('set-cookie')
+        app.serve(app_request(method='get', path='/missing'))
+        app.serve(app_request(method='get', path='/private'))
+    assert calls == ['cookie', 'missing', 'private'] * 2
+    assert cache.cache_info().currsize == 0
+
+
+def test_eviction(app: Chasha, app_request, clock):
+    cache = ResponseCache(ttl=10, max_entries=2, max_bytes=10)
+
+    @app.get('/{size}', cache=cache)
+    def index(size: int):
+        return 'x' * size
+
+    for size in (1, 2, 3):
+        app.serve(app_request(method='get', path=f'/{size}'))
+    assert cache.cache_info().currsize == 2
+
+    app.serve(app_request(method='get', path='/8'))
+    assert (cache.cache_info().currsize, cache.cache_info().nbytes) == (1, 8)
+
+    app.serve(app_request(method='get', path='/11'))
+    assert (cache.cache_info().currsize, cache.cache_info().nbytes) == (1, 8)
+
+
+def test_cached_response_processed(app_request, clock):
+    app = Chasha(compression=Compression(min_size=10))
+    api = Chashka(path_prefix='/api')
+
+    @api.get('/', cache=ResponseCache(ttl=10))
+    def index():
+        return 'content' * 10
+
+    app.include_app(api)
+
+    for _ in range(2):
+        response = app.serve(app_request(method='get', path='/api/', headers={'Accept-Encoding': 'gzip'}))
+        assert response.get_single_header('content-encoding') == 'gzip'
+    response = app.serve(app_request(method='get', path='/api/'))
+    assert response.get_single_header('content-encoding') is None
+    assert response.body == 'content' * 10
+
+
+def test_cached_async(app: Chasha, app_request, clock):
+    calls = []
+
+    @app.get('/', cache=ResponseCache(ttl=10))
+    async def index():
+        calls.append(1)
+        return 'index'
+
+    async def serve():
+        return [(await app.serve_async(app_request(method='get'))).body for _ in range(2)]
+
+    assert asyncio.run(serve()) == ['index', 'index']
+    assert len(calls) == 1
+
+
+def test_handle_request_override(app_request, clock):
+    class App(Chasha):
+        def handle_request(self, request):
+            response = super().handle_request(request)
+            response.set_header('x-handled', 'true')
+            return response
+
+    app = App()
+    calls = []
+    cache = ResponseCache(ttl=10)
+
+    @app.get('/', cache=cache)
+    def index():
+        calls.append(1)
+        return 'ok'
+
+    @app.get('/cookies', cache=cache)
+    def cookies(cookies: DI.Cookies = DI.cookies()):
+        cookies.set('visited', 'true')
+        return 'ok'
+
+    for _ in range(2):
+        response = app.serve(app_request(method='get'))
+        assert response.body == 'ok'
+        assert response.get_single_header('x-handled') == 'true'
+    assert calls == [1]
+
+    # not cached, finalized by handle_request and then by serve
+    response = app.serve(app_request(method='get', path='/cookies'))
+    assert response.get_header('set-cookie') == ['visited=true; Path=/']
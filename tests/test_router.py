@@ -1,7 +1,8 @@
 import uuid
 import pytest
 
-from chasha import Chasha, HttpNotFound, Chashka
+from chasha import Chasha, HttpNotFound, HttpMethodNotAllowed, Chashka
+from chasha.core import Router
 
 
 def test_route(app: Chasha, app_request):
@@ -197,3 +198,139 @@ def test_duplicate_route_get_any(app: Chasha, app_request):
         def index():
             return 'any'
     err.match(r"Routes for methods \(GET, POST\) on path '/' already exist")
+
+
+def test_405(app: Chasha, app_request):
+    @app.get('/items/{item_id}')
+    def get_item(item_id: int):
+        return 'ok'
+
+    with pytest.raises(HttpMethodNotAllowed):
+        app.handle_request(app_request(method='post', path='/items/1'))
+
+    with pytest.raises(HttpNotFound):
+        app.handle_request(app_request(method='post', path='/items/one'))
+
+
+def test_typed_order(app: Chasha, app_request):
+    @app.route('/items/{item_id}')
+    def by_id(item_id: int):
+        return f'id {item_id}'
+
+    @app.route('/items/{name}')
+    def by_name(name: str):
+        return f'name {name}'
+
+    @app.route('/items/{flag}/details')
+    def details(flag: bool):
+        return f'details {flag}'
+
+    response = app.serve(app_request(method='get', path='/items/42'))
+    assert response.body == 'id 42'
+
+    response = app.serve(app_request(method='get', path='/items/spoon'))
+    assert response.body == 'name spoon'
+
+    response = app.serve(app_request(method='get', path='/items/true/details'))
+    assert response.body == 'details True'
+
+    response = app.serve(app_request(method='get', path='/items/42/details'))
+    assert response.status_code == 404
+
+
+def test_trailing_slash(app: Chasha, app_request):
+    @app.route('/about')
+    def about():
+        return 'about'
+
+    response = app.serve(app_request(method='get', path='/about/'))
+    assert response.status_code == 404
+
+
+def test_sub_app_params(app: Chasha, app_request):
+    sub = Chashka(path_prefix='/sub')
+
+    @sub.get('/{item_id}/{name}')
+    def index(item_id: int, name: str):
+        return f'{name} {item_id}'
+
+    app.include_app(sub, prefix='/include')
+
+    response = app.serve(app_request(method='get', path='/include/sub/42/spoon'))
+    assert response.body == 'spoon 42'
+
+    response = app.serve(app_request(method='get', path='/sub/42/spoon'))
+    assert response.status_code == 404
+
+
+def test_static_lookup(app: Chasha, app_request, monkeypatch):
+    sub = Chashka(path_prefix='/sub')
+
+    @sub.route('/health')
+    def health():
+        return 'healthy'
+
+    @app.route('/{path}')
+    def handler(path: str):
+        return 'path'
+
+    @app.route('/about')
+    def about():
+        return 'about'
+
+    app.include_app(sub, prefix='/include')
+
+    def no_match(*args, **kwargs):
+        raise AssertionError('static route should not be matched by the tree')
+
+    monkeypatch.setattr(Router, '_match', no_match)
+
+    response = app.serve(app_request(method='post', path='/include/sub/health'))
+    assert response.body == 'healthy'
+
+    with pytest.raises(AssertionError):
+        # shadowed by the parametrized route registered earlier
+        app.handle_request(app_request(method='get', path='/about'))
+
+
+def test_route_cache(app_request):
+    app = Chasha(route_cache_size=2)
+
+    @app.get('/items/{item_id}')
+    def get_item(item_id: int):
+        assert isinstance(item_id, int)
+        return str(item_id)
+
+    for path in ('/items/1', '/items/1', '/items/2', '/items/1'):
+        response = app.serve(app_request(method='get', path=path))
+        assert response.body == path.split('/')[-1]
+    assert app.route_cache_info() == (2, 2, 2, 2)
+
+    response = app.serve(app_request(method='get', path='/items/3'))
+    assert response.body == '3'
+    assert app.route_cache_info().currsize == 2
+    assert app.route_cache_info().misses == 3
+
+
+def test_route_cache_errors(app_request):
+    app = Chasha(route_cache_size=10)
+
+    @app.get('/')
+    def index():
+        return 'ok'
+
+    for _ in range(2):
+        with pytest.raises(HttpNotFound):
+            app.handle_request(app_request(method='get', path='/unknown'))
+        with pytest.raises(HttpMethodNotAllowed) as e:
+            app.handle_request(app_request(method='post', path='/'))
+        assert e.match("Method 'POST' not allowed for path '/'")
+    assert app.route_cache_info().hits == 2
+    assert app.route_cache_info().misses == 2
+
+    @app.post('/')
+    def index_post():
+        return 'post'
+
+    response = app.serve(app_request(method='post', path='/'))
+    assert response.body == 'post'